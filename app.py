@@ -1,18 +1,35 @@
 import os
 import logging
 import json
-from flask import Flask, render_template, request, jsonify, session
-from openai import OpenAI, APIError
+import time
+from flask import Flask, Response, render_template, request, jsonify, session, stream_with_context, g, send_file
 from datetime import datetime
-import web_scraper
-from models import db, WatchedShow
+from sqlalchemy.exc import IntegrityError
+from recommendation_cache import recommendation_key, get_cached_recommendation, store_recommendation
+from collection_version import (
+    WATCHED_SHOWS, get_version, watched_shows_changed, not_modified_response, set_validators
+)
+from streaming import ShowStreamParser, sse_event
+from models import db, WatchedShow, normalize_title
+from migrations import upgrade_schema
+from scrape_cache import netflix_cache
+from catalog import netflix_catalog
+from local_recommender import LocalRecommender, LocalRecommenderUnavailable
+from poster_cache import poster_cache, PosterError
+import batch_ops
+from openai_clients import ClientCache, request_fingerprint
+from single_flight import SingleFlight
+from watched_listing import list_watched_shows
+from metrics import REGISTRY, REQUEST_DURATION, timed, server_timing_header
+from prompt_builder import TasteProfileCache, count_tokens
+from jobs import JobQueue, JOB_DONE, JOB_FAILED
 from dotenv import load_dotenv
 
 # Load environment variables from .env file if present
 load_dotenv()
 
 # Set up logging
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
 logger = logging.getLogger(__name__)
 
 # Default categories list (based on serie_tv_viste_da_Luca.txt)
@@ -21,12 +38,223 @@ TV_CATEGORIES = [
     "DRAMMATICHE", "FANTASY / SCI-FI", "ALTRE"
 ]
 
+# Used when neither FLASK_SECRET_KEY nor SESSION_SECRET is set
+DEFAULT_SECRET_KEY = "a secret key"
+
+# Identifies the deployed code in the page ETag, so a deploy that changes the
+# templates invalidates cached pages; falls back to the process start time
+APP_STARTED_ON = datetime.utcnow()
+BUILD_ID = (os.environ.get("BUILD_ID") or os.environ.get("RENDER_GIT_COMMIT")
+            or APP_STARTED_ON.strftime("%Y%m%d%H%M%S"))[:12]
+
+# Largest number of items accepted by the batch endpoints
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", 1000))
+
+# Page sizes for GET /watched_shows
+WATCHED_SHOWS_PAGE_SIZE = int(os.environ.get("WATCHED_SHOWS_PAGE_SIZE", 100))
+WATCHED_SHOWS_MAX_PAGE_SIZE = int(os.environ.get("WATCHED_SHOWS_MAX_PAGE_SIZE", 1000))
+
+# Model used for recommendations
+OPENAI_MODEL = os.environ.get("OPENAI_MODEL", "gpt-4o")
+
+# Pooled OpenAI clients per API key and coalescing of identical requests
+openai_clients = ClientCache(max_size=int(os.environ.get("OPENAI_CLIENT_CACHE_SIZE", 16)))
+in_flight_recommendations = SingleFlight()
+
+# Token budget for the watched-list part of the prompt
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", 2000))
+taste_profiles = TasteProfileCache(PROMPT_TOKEN_BUDGET, OPENAI_MODEL)
+
+# Recommendation mode ('openai' or the local catalog-based 'local') and
+# whether the local recommender stands in when the OpenAI pipeline fails
+RECOMMENDATION_MODES = ('openai', 'local')
+RECOMMENDATION_MODE = os.environ.get("RECOMMENDATION_MODE", "openai")
+LOCAL_RECOMMENDER_FALLBACK = os.environ.get("LOCAL_RECOMMENDER_FALLBACK", "True").lower() == "true"
+local_recommender = LocalRecommender(
+    netflix_catalog, max_features=int(os.environ.get("LOCAL_RECOMMENDER_FEATURES", 1024))
+)
+
+# Browser cache lifetime (seconds) of proxied posters; their URLs never change content
+POSTER_MAX_AGE = int(os.environ.get("POSTER_MAX_AGE", 365 * 24 * 3600))
+
+# Background recommendation jobs
+job_queue = JobQueue(
+    max_workers=int(os.environ.get("JOB_WORKERS", 2)),
+    result_ttl=int(os.environ.get("JOB_RESULT_TTL", 3600)),
+    timeout=int(os.environ.get("JOB_TIMEOUT", 300)),
+)
+
+def build_recommendation_messages(taste_profile):
+    """
+    Build the chat messages asking the model for recommendations.
+    taste_profile is the text produced by prompt_builder.build_taste_profile.
+    """
+    prompt = f"""Considerando {taste_profile}, 
+    suggeriscimi 5 nuove serie TV disponibili su Netflix Italia che sono uscite di recente 
+    e che potrebbero piacermi in base ai miei gusti. 
+    Importante: assicurati che siano serie TV che esistono realmente su Netflix Italia,
+    possibilmente usando riferimenti da siti come "Netflix Lovers Italia".
+    Includi SOLO titoli verificabili e garantisci che le URL delle immagini e delle schede
+    siano funzionanti (preferibilmente da TMDB o Netflix/IMDB ufficiali)."""
+    
+    return [
+        {"role": "system", "content": f"""Sei un assistente esperto di serie TV che conosce tutti i nuovi rilasci. 
+        Oggi è {datetime.now().strftime("%Y-%m-%d")}. Devi raccomandare SOLO serie TV recenti disponibili su Netflix in Italia.
+        Analizza le preferenze dell'utente basandoti sulle serie TV che ha già visto.
+        Formatta la risposta in JSON con un array 'shows' contenente oggetti con campi:
+        'title': il titolo effettivo della serie TV,
+        'genre': il genere o i generi principali,
+        'description': una breve descrizione della trama,
+        'release_date': la data di uscita su Netflix Italia,
+        'similar_to': elenco di 1-3 serie già viste dall'utente a cui potrebbe essere simile,
+        'image_url': URL ad un'immagine della locandina (usa l'URL reale di Netflix o TMDB),
+        'info_url': URL alla pagina ufficiale Netflix o IMDB della serie TV."""},
+        {"role": "user", "content": prompt}
+    ]
+
+def local_recommendations(fallback=False):
+    """
+    Recommendations from the local catalog-based recommender, in the payload
+    shape of /get_recommendations. Needs an app context.
+    """
+    with timed("local_recommender"):
+        shows = local_recommender.recommend()
+    result = {
+        'response': json.dumps({'shows': shows}),
+        'watched_count': local_recommender.watched_count,
+        'mode': 'local'
+    }
+    if fallback:
+        result['fallback'] = True
+    return result
+
+def local_fallback(error):
+    """Local recommendations to serve instead of a failed OpenAI pipeline, or None"""
+    if not LOCAL_RECOMMENDER_FALLBACK or not local_recommender.available():
+        return None
+    try:
+        result = local_recommendations(fallback=True)
+    except Exception as e:
+        logger.warning(f"Local fallback unavailable: {str(e)}")
+        return None
+    logger.warning(f"OpenAI pipeline failed ({str(error)}), serving local recommendations")
+    return result
+
+def generate_recommendations(api_key, refresh=False, mode=None):
+    """
+    Run the whole recommendation pipeline: OpenAI completion plus
+    verification of each show, or the local recommender when mode is 'local'
+    or the OpenAI pipeline fails. Needs an app context; returns the JSON
+    payload served by /get_recommendations.
+    """
+    if (mode or RECOMMENDATION_MODE) == 'local':
+        return local_recommendations()
+    
+    # Describe the watched list within the prompt token budget
+    with timed("watched_list"):
+        profile = taste_profiles.get(get_version(WATCHED_SHOWS)[0])
+    watched_titles = profile.titles
+    
+    # Reuse today's recommendations for this watched list unless a refresh is forced
+    cache_key = recommendation_key(watched_titles, OPENAI_MODEL)
+    if not refresh:
+        with timed("cache_lookup"):
+            cached_response = get_cached_recommendation(cache_key)
+        if cached_response is not None:
+            return {
+                'response': cached_response,
+                'watched_count': len(watched_titles),
+                'cached': True
+            }
+    
+    with timed("prompt"):
+        messages = build_recommendation_messages(profile.text)
+    
+    def run_pipeline():
+        log_prompt_size(messages)
+        
+        # Reuse the pooled OpenAI client for this API key
+        client = openai_clients.get(api_key)
+        
+        with timed("openai"):
+            completion = client.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=messages,
+                response_format={"type": "json_object"}
+            )
+        
+        response = completion.choices[0].message.content
+        # Parse the JSON response to ensure it's valid
+        with timed("json_parse"):
+            recommendations = json.loads(response)
+        
+        # Process recommendations using our web scraper to verify and enhance data
+        logger.info("Processing recommendations with web_scraper...")
+        import web_scraper
+        with timed("enrichment"):
+            processed_response = web_scraper.process_openai_recommendations(response)
+        with timed("cache_store"):
+            store_recommendation(cache_key, processed_response)
+        
+        return {
+            'response': processed_response,
+            'watched_count': len(watched_titles)
+        }
+    
+    # Identical concurrent requests share a single upstream call
+    try:
+        return in_flight_recommendations.do(
+            request_fingerprint(api_key, OPENAI_MODEL, messages), run_pipeline
+        )
+    except Exception as e:
+        result = local_fallback(e)
+        if result is None:
+            raise
+        return result
+
+def replay_recommendations(response, watched_count, **summary):
+    """SSE events for an already complete response (cached or local)"""
+    shows = json.loads(response).get('shows', [])
+    for index, show in enumerate(shows):
+        yield sse_event('show', {'index': index, 'show': show})
+        yield sse_event('enriched', {'index': index, 'show': show})
+    yield sse_event('summary', dict({
+        'response': response,
+        'watched_count': watched_count,
+        'total': len(shows),
+        'verified': sum(1 for show in shows if show.get('verified'))
+    }, **summary))
+
+def event_stream(events):
+    return Response(stream_with_context(events), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+def log_prompt_size(messages):
+    """Log the measured size of the prompt before it is sent"""
+    tokens = sum(count_tokens(message["content"], OPENAI_MODEL) for message in messages)
+    logger.info(f"Sending recommendation prompt: {tokens} tokens")
+    return tokens
+
+def recommendation_error_message(e):
+    """Log a pipeline error and return the message shown to the user"""
+    from openai import APIError
+    if isinstance(e, APIError):
+        logger.error(f"OpenAI API error: {str(e)}")
+        return f'OpenAI API error: {str(e)}'
+    if isinstance(e, json.JSONDecodeError):
+        logger.error(f"JSON decode error: {str(e)}")
+        return f'Errore nel formato della risposta: {str(e)}'
+    logger.error(f"Error calling OpenAI: {str(e)}")
+    return f'Errore: {str(e)}'
+
 def create_app():
     """Create and configure the Flask application"""
     app = Flask(__name__)
     
     # setup a secret key, required by sessions
-    app.secret_key = os.environ.get("FLASK_SECRET_KEY") or os.environ.get("SESSION_SECRET") or "a secret key"
+    app.secret_key = os.environ.get("FLASK_SECRET_KEY") or os.environ.get("SESSION_SECRET") or DEFAULT_SECRET_KEY
     
     # Configure the database - prioritize DATABASE_URL for Render compatibility
     database_url = os.environ.get("DATABASE_URL")
@@ -49,31 +277,115 @@ def create_app():
     # Initialize database with app
     db.init_app(app)
     
-    with app.app_context():
-        # Create tables
-        db.create_all()
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create missing tables and migrate existing ones"""
+        upgrade_schema()
+        print("Database initialized")
+    
+    # Persist scraper lookups in the database
+    netflix_cache.init_app(app)
+    netflix_catalog.init_app(app)
+    
+    # Local copies of recommendation posters; signatures made with the public
+    # default key could be forged, so the proxy stays off without a real one
+    if app.secret_key == DEFAULT_SECRET_KEY:
+        logger.warning("FLASK_SECRET_KEY not set: the poster proxy is disabled")
+    else:
+        poster_cache.init_app(app)
+    
+    # Run queued recommendation jobs in this process
+    job_queue.init_app(app, generate_recommendations, recommendation_error_message)
+    
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+    
+    @app.after_request
+    def record_request_timing(response):
+        """Record request latency and add Server-Timing when asked for it"""
+        start = g.get('request_start')
+        if start is not None:
+            REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                endpoint=request.url_rule.rule if request.url_rule else 'unmatched',
+                method=request.method,
+                status=response.status_code
+            )
+        if request.headers.get('X-Server-Timing') or request.args.get('server_timing'):
+            header = server_timing_header()
+            if header:
+                response.headers['Server-Timing'] = header
+        return response
     
     # Register routes
+    @app.route('/metrics')
+    def metrics():
+        """Prometheus metrics for this worker process"""
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
     @app.route('/')
     def index():
         """Render the main page with watched shows"""
+        # Nothing to render if the client already has this version of the list
+        with timed("db"):
+            version, updated_on = get_version(WATCHED_SHOWS)
+        etag = f"index-{BUILD_ID}-{version}"
+        # Pages rendered before this process started may use an older template
+        if updated_on is None or updated_on < APP_STARTED_ON:
+            updated_on = APP_STARTED_ON
+        not_modified = not_modified_response(etag, updated_on)
+        if not_modified is not None:
+            return not_modified
+        
         # Get all watched shows from database
-        watched_shows = WatchedShow.query.all()
-        watched_shows_by_category = {}
+        with timed("db"):
+            watched_shows = WatchedShow.query.all()
         
-        # Group shows by category
-        for category in TV_CATEGORIES:
-            watched_shows_by_category[category] = WatchedShow.query.filter_by(category=category).all()
+        # Group shows by category, keeping the default categories first
+        watched_shows_by_category = {category: [] for category in TV_CATEGORIES}
+        for show in watched_shows:
+            if show.category:
+                watched_shows_by_category.setdefault(show.category, []).append(show)
+        
+        with timed("render"):
+            response = app.make_response(render_template('index.html', 
+                              watched_shows=watched_shows,
+                              watched_shows_by_category=watched_shows_by_category,
+                              categories=list(watched_shows_by_category)))
+        return set_validators(response, etag, updated_on)
+
+    @app.route('/posters', methods=['GET'])
+    def get_poster():
+        """Serve a cached, resized copy of a poster linked by a recommendation"""
+        url = request.args.get('url', '')
+        if not url:
+            return jsonify({'error': 'Parametro url mancante'}), 400
+        try:
+            with timed("poster"):
+                poster = poster_cache.get(url, request.args.get('w', type=int), request.args.get('sig'))
+        except PosterError as e:
+            return jsonify({'error': str(e)}), e.status
         
-        return render_template('index.html', 
-                          watched_shows=watched_shows,
-                          watched_shows_by_category=watched_shows_by_category,
-                          categories=TV_CATEGORIES)
+        response = send_file(poster.path, mimetype=poster.content_type, etag=poster.etag,
+                             conditional=True, max_age=POSTER_MAX_AGE)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
 
     @app.route('/get_recommendations', methods=['POST'])
     def get_recommendations():
         """Process OpenAI API request for personalized TV show recommendations"""
         try:
+            mode = request.json.get('mode') or RECOMMENDATION_MODE
+            if mode not in RECOMMENDATION_MODES:
+                return jsonify({'error': f'Modalità non valida: {mode}'}), 400
+            if mode == 'local':
+                try:
+                    return jsonify(local_recommendations())
+                except LocalRecommenderUnavailable as e:
+                    return jsonify({'error': str(e)}), 503
+            
             # Get API key from request or environment variable
             api_key = request.json.get('api_key')
             if not api_key:
@@ -84,78 +396,182 @@ def create_app():
             # Store API key in session for this session only
             session['api_key'] = api_key
             
-            # Get all watched shows from database
-            watched_shows = WatchedShow.query.all()
-            watched_titles = [show.title for show in watched_shows]
-            watched_titles_str = ", ".join(watched_titles)
+            try:
+                return jsonify(generate_recommendations(api_key, refresh=bool(request.json.get('refresh')), mode=mode))
+            except Exception as e:
+                return jsonify({'error': recommendation_error_message(e)}), 500
+                
+        except Exception as e:
+            logger.error(f"Unexpected error: {str(e)}")
+            return jsonify({'error': f'Errore imprevisto: {str(e)}'}), 500
+
+    @app.route('/recommendation_jobs', methods=['POST'])
+    def create_recommendation_job():
+        """Queue a recommendation request and return its job id right away"""
+        try:
+            data = request.get_json(silent=True) or {}
+            mode = data.get('mode') or RECOMMENDATION_MODE
+            if mode not in RECOMMENDATION_MODES:
+                return jsonify({'error': f'Modalità non valida: {mode}'}), 400
+            api_key = data.get('api_key') or os.environ.get("OPENAI_API_KEY")
+            if not api_key and mode != 'local':
+                return jsonify({'error': 'API key è necessaria'}), 400
             
-            # Initialize OpenAI client
-            client = OpenAI(api_key=api_key)
+            # Store API key in session for this session only
+            if api_key:
+                session['api_key'] = api_key
             
-            # Create prompt for OpenAI
+            job = job_queue.submit(api_key, refresh=bool(data.get('refresh')), mode=mode)
+            return jsonify(dict(job.to_dict(), status_url=f'/recommendation_jobs/{job.id}')), 202
+        except Exception as e:
+            logger.error(f"Error queueing recommendation job: {str(e)}")
+            return jsonify({'error': f'Errore: {str(e)}'}), 500
+
+    @app.route('/recommendation_jobs/<job_id>', methods=['GET'])
+    def get_recommendation_job(job_id):
+        """Get the status of a recommendation job"""
+        job = job_queue.get(job_id)
+        if not job:
+            return jsonify({'error': 'Richiesta non trovata'}), 404
+        return jsonify(job.to_dict())
+
+    @app.route('/recommendation_jobs/<job_id>/result', methods=['GET'])
+    def get_recommendation_job_result(job_id):
+        """Get the recommendations produced by a finished job"""
+        job = job_queue.get(job_id)
+        if not job:
+            return jsonify({'error': 'Richiesta non trovata'}), 404
+        if job.status == JOB_FAILED:
+            return jsonify({'error': job.error}), 500
+        if job.status != JOB_DONE:
+            return jsonify(job.to_dict()), 202
+        return jsonify(json.loads(job.result))
+
+    @app.route('/get_recommendations/stream', methods=['POST'])
+    def stream_recommendations():
+        """Stream recommendations as Server-Sent Events while they are generated"""
+        data = request.get_json(silent=True) or {}
+        mode = data.get('mode') or RECOMMENDATION_MODE
+        if mode not in RECOMMENDATION_MODES:
+            return jsonify({'error': f'Modalità non valida: {mode}'}), 400
+        if mode == 'local':
             try:
-                prompt = f"""Considerando le serie TV che ho già visto: {watched_titles_str}, 
-                suggeriscimi 5 nuove serie TV disponibili su Netflix Italia che sono uscite di recente 
-                e che potrebbero piacermi in base ai miei gusti. 
-                Importante: assicurati che siano serie TV che esistono realmente su Netflix Italia,
-                possibilmente usando riferimenti da siti come "Netflix Lovers Italia".
-                Includi SOLO titoli verificabili e garantisci che le URL delle immagini e delle schede
-                siano funzionanti (preferibilmente da TMDB o Netflix/IMDB ufficiali)."""
-                
-                completion = client.chat.completions.create(
-                    model="gpt-4o", # Using the latest model
-                    messages=[
-                        {"role": "system", "content": f"""Sei un assistente esperto di serie TV che conosce tutti i nuovi rilasci. 
-                        Oggi è {datetime.now().strftime("%Y-%m-%d")}. Devi raccomandare SOLO serie TV recenti disponibili su Netflix in Italia.
-                        Analizza le preferenze dell'utente basandoti sulle serie TV che ha già visto.
-                        Formatta la risposta in JSON con un array 'shows' contenente oggetti con campi:
-                        'title': il titolo effettivo della serie TV,
-                        'genre': il genere o i generi principali,
-                        'description': una breve descrizione della trama,
-                        'release_date': la data di uscita su Netflix Italia,
-                        'similar_to': elenco di 1-3 serie già viste dall'utente a cui potrebbe essere simile,
-                        'image_url': URL ad un'immagine della locandina (usa l'URL reale di Netflix o TMDB),
-                        'info_url': URL alla pagina ufficiale Netflix o IMDB della serie TV."""},
-                        {"role": "user", "content": prompt}
-                    ],
-                    response_format={"type": "json_object"}
+                result = local_recommendations()
+            except LocalRecommenderUnavailable as e:
+                return jsonify({'error': str(e)}), 503
+            return event_stream(replay_recommendations(result['response'], result['watched_count'], mode='local'))
+        
+        api_key = data.get('api_key') or os.environ.get("OPENAI_API_KEY")
+        if not api_key:
+            return jsonify({'error': 'API key è necessaria'}), 400
+        
+        # Store API key in session for this session only
+        session['api_key'] = api_key
+        
+        profile = taste_profiles.get(get_version(WATCHED_SHOWS)[0])
+        watched_titles = profile.titles
+        cache_key = recommendation_key(watched_titles, OPENAI_MODEL)
+        cached_response = None if data.get('refresh') else get_cached_recommendation(cache_key)
+        messages = build_recommendation_messages(profile.text)
+        if cached_response is None:
+            log_prompt_size(messages)
+        client = openai_clients.get(api_key)
+        
+        def generate():
+            import web_scraper
+            parser = ShowStreamParser()
+            
+            def model_shows():
+                stream = client.chat.completions.create(
+                    model=OPENAI_MODEL,
+                    messages=messages,
+                    response_format={"type": "json_object"},
+                    stream=True
                 )
+                for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    content = chunk.choices[0].delta.content
+                    if content:
+                        yield from parser.feed(content)
+            
+            enriched = {}
+            shown = False
+            try:
+                for kind, index, show in web_scraper.iter_enrichment(model_shows()):
+                    if kind == 'show':
+                        shown = True
+                        yield sse_event('show', {'index': index, 'show': show})
+                    else:
+                        enriched[index] = show
+                        yield sse_event('enriched', {'index': index, 'show': show})
                 
-                response = completion.choices[0].message.content
-                # Parse the JSON response to ensure it's valid
-                recommendations = json.loads(response)
-                
-                # Process recommendations using our web scraper to verify and enhance data
-                logger.info("Processing recommendations with web_scraper...")
-                processed_response = web_scraper.process_openai_recommendations(response)
-                
-                return jsonify({
+                # Same payload as the non-streaming endpoint
+                recommendations = json.loads(parser.text)
+                recommendations['shows'] = [enriched[index] for index in sorted(enriched)]
+                processed_response = json.dumps(recommendations)
+                store_recommendation(cache_key, processed_response)
+                yield sse_event('summary', {
                     'response': processed_response,
-                    'watched_count': len(watched_titles)
+                    'watched_count': len(watched_titles),
+                    'total': len(enriched),
+                    'verified': sum(1 for show in enriched.values() if show.get('verified'))
                 })
-                
-            except APIError as e:
-                logger.error(f"OpenAI API error: {str(e)}")
-                return jsonify({'error': f'OpenAI API error: {str(e)}'}), 500
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON decode error: {str(e)}")
-                return jsonify({'error': f'Errore nel formato della risposta: {str(e)}'}), 500
             except Exception as e:
-                logger.error(f"Error calling OpenAI: {str(e)}")
-                return jsonify({'error': f'Errore: {str(e)}'}), 500
-                
-        except Exception as e:
-            logger.error(f"Unexpected error: {str(e)}")
-            return jsonify({'error': f'Errore imprevisto: {str(e)}'}), 500
+                # Before the first show the client can still get local recommendations
+                result = None if shown else local_fallback(e)
+                if result is None:
+                    yield sse_event('error', {'error': recommendation_error_message(e)})
+                else:
+                    yield from replay_recommendations(
+                        result['response'], result['watched_count'], mode='local', fallback=True
+                    )
+        
+        if cached_response is not None:
+            return event_stream(replay_recommendations(cached_response, len(watched_titles), cached=True))
+        return event_stream(generate())
 
     @app.route('/watched_shows', methods=['GET'])
     def get_watched_shows():
-        """Get all watched shows"""
+        """
+        Get watched shows.
+        Optional query parameters: limit and cursor (keyset pagination),
+        order (id or added_on), category, title_prefix and fields.
+        Without limit or cursor every show is returned.
+        """
         try:
-            watched_shows = WatchedShow.query.all()
-            return jsonify({
-                'shows': [show.to_dict() for show in watched_shows]
-            })
+            with timed("db"):
+                version, updated_on = get_version(WATCHED_SHOWS)
+            etag = f"watched-shows-{version}"
+            not_modified = not_modified_response(etag, updated_on)
+            if not_modified is not None:
+                return not_modified
+            
+            args = request.args
+            limit = args.get('limit', type=int)
+            if args.get('cursor') and limit is None:
+                limit = WATCHED_SHOWS_PAGE_SIZE
+            if limit is not None:
+                limit = max(1, min(limit, WATCHED_SHOWS_MAX_PAGE_SIZE))
+            try:
+                with timed("db"):
+                    shows, next_cursor = list_watched_shows(
+                        limit,
+                        cursor=args.get('cursor'),
+                        category=args.get('category'),
+                        title_prefix=args.get('title_prefix'),
+                        fields=args.get('fields'),
+                        order=args.get('order', 'id')
+                    )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            with timed("serialize"):
+                payload = {'shows': shows}
+                if limit is not None:
+                    payload['next_cursor'] = next_cursor
+                response = jsonify(payload)
+            return set_validators(response, etag, updated_on)
         except Exception as e:
             logger.error(f"Error getting watched shows: {str(e)}")
             return jsonify({'error': f'Errore: {str(e)}'}), 500
@@ -171,17 +587,24 @@ def create_app():
             if not title:
                 return jsonify({'error': 'Il titolo è necessario'}), 400
             
-            # Check if show already exists
-            existing_show = WatchedShow.query.filter_by(title=title).first()
+            # Check if show already exists (index lookup on the normalized title)
+            duplicate_message = f'La serie TV "{title}" è già nella tua lista'
+            existing_show = WatchedShow.query.filter_by(title_key=normalize_title(title)).first()
             if existing_show:
-                return jsonify({'error': f'La serie TV "{title}" è già nella tua lista'}), 400
+                return jsonify({'error': duplicate_message}), 400
             
             new_show = WatchedShow(
                 title=title,
                 category=category
             )
             db.session.add(new_show)
-            db.session.commit()
+            watched_shows_changed()
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # A concurrent request added the same title first
+                db.session.rollback()
+                return jsonify({'error': duplicate_message}), 400
             
             return jsonify({
                 'message': f'Serie TV "{title}" aggiunta con successo',
@@ -191,6 +614,50 @@ def create_app():
             logger.error(f"Error adding watched show: {str(e)}")
             return jsonify({'error': f'Errore: {str(e)}'}), 500
 
+    @app.route('/watched_shows/batch', methods=['POST'])
+    def add_watched_shows_batch():
+        """Add several watched shows in a single transaction"""
+        try:
+            data = request.get_json(silent=True) or {}
+            shows = data.get('shows')
+            if not isinstance(shows, list) or not shows:
+                return jsonify({'error': 'È necessario un elenco di serie TV'}), 400
+            if len(shows) > BATCH_MAX_ITEMS:
+                return jsonify({'error': f'Massimo {BATCH_MAX_ITEMS} serie TV per richiesta'}), 400
+            
+            results = batch_ops.add_shows(shows)
+            return jsonify({
+                'results': results,
+                'added': sum(1 for result in results if result['status'] == 'added'),
+                'duplicates': sum(1 for result in results if result['status'] == 'duplicate')
+            })
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error adding watched shows: {str(e)}")
+            return jsonify({'error': f'Errore: {str(e)}'}), 500
+
+    @app.route('/watched_shows/batch', methods=['DELETE'])
+    def delete_watched_shows_batch():
+        """Delete several watched shows by id in a single transaction"""
+        try:
+            data = request.get_json(silent=True) or {}
+            ids = data.get('ids')
+            if not isinstance(ids, list) or not ids:
+                return jsonify({'error': 'È necessario un elenco di id'}), 400
+            if len(ids) > BATCH_MAX_ITEMS:
+                return jsonify({'error': f'Massimo {BATCH_MAX_ITEMS} serie TV per richiesta'}), 400
+            
+            results = batch_ops.delete_shows(ids)
+            return jsonify({
+                'results': results,
+                'deleted': sum(1 for result in results if result['status'] == 'deleted'),
+                'not_found': sum(1 for result in results if result['status'] == 'not_found')
+            })
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error deleting watched shows: {str(e)}")
+            return jsonify({'error': f'Errore: {str(e)}'}), 500
+
     @app.route('/watched_shows/<int:id>', methods=['DELETE'])
     def delete_watched_show(id):
         """Delete a watched show"""
@@ -200,6 +667,7 @@ def create_app():
                 return jsonify({'error': 'Serie TV non trovata'}), 404
             
             db.session.delete(show)
+            watched_shows_changed()
             db.session.commit()
             
             return jsonify({
@@ -215,5 +683,9 @@ def create_app():
 app = create_app()
 
 if __name__ == "__main__":
+    # The development server sets up the schema itself; deployments run `flask --app app init-db`
+    with app.app_context():
+        upgrade_schema()
+    
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port, debug=os.environ.get("DEBUG", "True").lower() == "true")
\ No newline at end of file
@@ -0,0 +1,131 @@
+import logging
+
+from sqlalchemy import insert, delete, select
+from sqlalchemy.exc import IntegrityError
+
+from models import db, WatchedShow, normalize_title
+from collection_version import watched_shows_changed
+
+logger = logging.getLogger(__name__)
+
+# Keeps IN (...) lists below SQLite's bound parameter limit
+CHUNK_SIZE = 500
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def existing_title_keys(keys):
+    """Return the subset of normalized title keys already in watched_shows"""
+    found = set()
+    for chunk in _chunks(list(keys)):
+        found.update(db.session.scalars(
+            select(WatchedShow.title_key).where(WatchedShow.title_key.in_(chunk))
+        ))
+    return found
+
+
+def _plan_additions(items):
+    """Split items into per-item results and the rows that need inserting"""
+    results = []
+    rows = []
+    batch_keys = set()
+    for item in items:
+        title = item.get('title') if isinstance(item, dict) else None
+        # Non-string titles (numbers, lists...) are invalid like empty ones
+        title = title.strip() if isinstance(title, str) else None
+        category = item.get('category') if isinstance(item, dict) else None
+        # The category is optional, but when given it must be a string too
+        if not title or not (category is None or isinstance(category, str)):
+            results.append({'title': title, 'status': 'invalid'})
+            continue
+        key = normalize_title(title)
+        if key in batch_keys:
+            results.append({'title': title, 'status': 'duplicate'})
+            continue
+        batch_keys.add(key)
+        results.append({'title': title, 'status': 'added', 'key': key})
+        rows.append({'title': title, 'title_key': key, 'category': category})
+    
+    existing = existing_title_keys(batch_keys)
+    for result in results:
+        if result.get('key') in existing:
+            result['status'] = 'duplicate'
+    rows = [row for row in rows if row['title_key'] not in existing]
+    return results, rows
+
+
+def add_shows(items, attempts=2):
+    """
+    Add several shows in one transaction.
+    items is a list of {'title': ..., 'category': ...}; each result reports
+    'added' (with the new id), 'duplicate' or 'invalid'.
+    """
+    for attempt in range(attempts):
+        results, rows = _plan_additions(items)
+        try:
+            if rows:
+                db.session.execute(insert(WatchedShow), rows)
+                watched_shows_changed()
+            db.session.commit()
+            break
+        except IntegrityError:
+            # A concurrent request added one of the titles; plan again
+            db.session.rollback()
+            if attempt == attempts - 1:
+                raise
+            logger.warning("Concurrent insert detected, retrying batch")
+    
+    added_keys = [result['key'] for result in results if result['status'] == 'added']
+    ids = {}
+    for chunk in _chunks(added_keys):
+        ids.update(db.session.execute(
+            select(WatchedShow.title_key, WatchedShow.id).where(WatchedShow.title_key.in_(chunk))
+        ).all())
+    for result in results:
+        key = result.pop('key', None)
+        if result['status'] == 'added':
+            result['id'] = ids.get(key)
+    return results
+
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def delete_shows(ids):
+    """
+    Delete several shows by id in one transaction.
+    Each result reports 'deleted', 'not_found', 'invalid' or 'duplicate'
+    for an id already listed earlier in the request.
+    """
+    valid_ids = {show_id for show_id in ids if _is_id(show_id)}
+    existing = set()
+    for chunk in _chunks(list(valid_ids)):
+        existing.update(db.session.scalars(
+            select(WatchedShow.id).where(WatchedShow.id.in_(chunk))
+        ))
+    
+    for chunk in _chunks(list(existing)):
+        db.session.execute(delete(WatchedShow).where(WatchedShow.id.in_(chunk)))
+    if existing:
+        watched_shows_changed()
+    db.session.commit()
+    
+    results = []
+    seen = set()
+    for show_id in ids:
+        if not _is_id(show_id):
+            status = 'invalid'
+        elif show_id in seen:
+            status = 'duplicate'
+        elif show_id in existing:
+            status = 'deleted'
+        else:
+            status = 'not_found'
+        if _is_id(show_id):
+            seen.add(show_id)
+        results.append({'id': show_id, 'status': status})
+    return results
@@ -0,0 +1,191 @@
+"""
+Offline end-to-end benchmark for GET /watched_shows and /get_recommendations.
+
+Starts local stand-ins for OpenAI and netflixlovers.it (benchmarks/stubs.py),
+runs the app on a threaded local server against a temporary SQLite database,
+seeds watched_shows at each requested size and reports p50/p95/p99 latency
+and throughput per endpoint. Results can be saved and compared against a
+previous run to check performance changes.
+
+Uncached recommendation requests are sent one at a time: identical concurrent
+requests share a single upstream call, so running them in parallel would time
+that one call. GET / is not measured because the tree has no
+templates/index.html, so it only exercises the error path.
+
+Usage:
+    python benchmarks/bench_endpoints.py --sizes 10,1000,100000 --save baseline.json
+    python benchmarks/bench_endpoints.py --sizes 10,1000,100000 --baseline baseline.json
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stubs import OpenAIStub, NetflixLoversStub
+
+ENDPOINTS = [
+    # (name, method, path, json body, uncached: fewer requests, sent one at a time)
+    ('GET /watched_shows', 'GET', '/watched_shows', None, False),
+    ('POST /get_recommendations (refresh)', 'POST', '/get_recommendations', {'refresh': True}, True),
+    ('POST /get_recommendations (cached)', 'POST', '/get_recommendations', {}, False),
+]
+
+
+def percentile(values, fraction):
+    """Linear-interpolated percentile of a sorted list"""
+    if not values:
+        return 0.0
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def seed_watched_shows(app_module, size):
+    """Replace watched_shows with size generated rows"""
+    from sqlalchemy import insert
+    from models import db, WatchedShow, normalize_title
+    from collection_version import watched_shows_changed
+    from migrations import upgrade_schema
+
+    categories = app_module.TV_CATEGORIES
+    with app_module.app.app_context():
+        upgrade_schema()
+        db.session.query(WatchedShow).delete()
+        for start in range(0, size, 5000):
+            rows = []
+            for index in range(start, min(start + 5000, size)):
+                title = f'Serie Vista {index}'
+                rows.append({
+                    'title': title,
+                    'title_key': normalize_title(title),
+                    'category': categories[index % len(categories)],
+                })
+            db.session.execute(insert(WatchedShow), rows)
+        watched_shows_changed()
+        db.session.commit()
+
+
+def run_endpoint(base_url, method, path, body, requests_count, concurrency):
+    """Send requests_count requests with concurrency workers; returns stats"""
+    local = threading.local()
+
+    def one_request(_):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        response = session.request(method, base_url + path, json=body, timeout=120)
+        response.content
+        return time.perf_counter() - start, response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one_request, range(requests_count)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency * 1000 for latency, _ in results)
+    return {
+        'requests': requests_count,
+        'errors': sum(1 for _, status in results if status >= 400),
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+        'throughput_rps': requests_count / elapsed if elapsed else 0.0,
+    }
+
+
+def print_results(results, baseline=None):
+    header = f"{'rows':>7}  {'endpoint':<38} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8} {'errors':>6}"
+    if baseline:
+        header += f" {'p50 vs base':>12}"
+    print(header)
+    for size, endpoints in results.items():
+        for name, stats in endpoints.items():
+            line = (f"{size:>7}  {name:<38} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} "
+                    f"{stats['p99_ms']:>9.1f} {stats['throughput_rps']:>8.1f} {stats['errors']:>6}")
+            base = (baseline or {}).get(size, {}).get(name)
+            if base and base['p50_ms']:
+                change = (stats['p50_ms'] - base['p50_ms']) / base['p50_ms'] * 100
+                line += f" {change:>+11.1f}%"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end endpoint benchmark")
+    parser.add_argument('--sizes', default='10,100,1000,10000,100000',
+                        help="comma-separated watched_shows sizes to seed")
+    parser.add_argument('--requests', type=int, default=200, help="requests per endpoint")
+    parser.add_argument('--recommendation-requests', type=int, default=10,
+                        help="requests for the uncached recommendation endpoint")
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help="parallel requests for the cached endpoints")
+    parser.add_argument('--openai-latency', type=float, default=1.0, help="seconds per completion")
+    parser.add_argument('--shows', type=int, default=5, help="shows per completion")
+    parser.add_argument('--scrape-delay', type=float, default=0.2, help="seconds per scraper request")
+    parser.add_argument('--scrape-failure-rate', type=float, default=0.0)
+    parser.add_argument('--scrape-not-found-rate', type=float, default=0.0)
+    parser.add_argument('--save', help="write results as JSON to this path")
+    parser.add_argument('--baseline', help="compare against results saved with --save")
+    args = parser.parse_args()
+
+    openai_stub = OpenAIStub(latency=args.openai_latency, shows_per_response=args.shows).start()
+    lovers_stub = NetflixLoversStub(delay=args.scrape_delay, failure_rate=args.scrape_failure_rate,
+                                    not_found_rate=args.scrape_not_found_rate).start()
+    workdir = tempfile.mkdtemp(prefix='apicalendar-bench-')
+
+    # Must be set before the app and scraper modules are imported
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['POSTER_CACHE_DIR'] = os.path.join(workdir, 'posters')
+    os.environ['OPENAI_BASE_URL'] = openai_stub.url + '/v1'
+    os.environ['OPENAI_API_KEY'] = 'stub-key'
+    os.environ['NETFLIX_LOVERS_URL'] = lovers_stub.url
+
+    import app as app_module
+    from werkzeug.serving import make_server
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger('urllib3').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    results = {}
+    try:
+        for size in [int(size) for size in args.sizes.split(',') if size.strip()]:
+            seed_watched_shows(app_module, size)
+            results[str(size)] = {}
+            for name, method, path, body, slow in ENDPOINTS:
+                count = args.recommendation_requests if slow else args.requests
+                results[str(size)][name] = run_endpoint(base_url, method, path, body,
+                                                        count, 1 if slow else args.concurrency)
+    finally:
+        server.shutdown()
+        openai_stub.stop()
+        lovers_stub.stop()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+    print_results(results, baseline)
+    print(f"OpenAI stub calls: {openai_stub.calls}, Netflix Lovers stub requests: {lovers_stub.requests}")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
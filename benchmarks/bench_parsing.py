@@ -0,0 +1,121 @@
+"""
+Benchmark the Netflix Lovers HTML parsing on the fixture pages.
+
+The fixtures in benchmarks/fixtures are synthetic: WordPress-like pages with
+the markup the parsers look for, padded with generated stylesheets, scripts
+and filler text to a realistic size. They are not saved netflixlovers.it
+pages, so timings on the live site will differ.
+
+Reports CPU time and peak memory per parse for the targeted parsers in
+html_extract and, when beautifulsoup4 is installed, for the previous
+full-tree BeautifulSoup parse and a SoupStrainer-filtered variant.
+
+Usage: python benchmarks/bench_parsing.py [--iterations N]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html_extract import parse_first_search_result, parse_article_description
+
+try:
+    from bs4 import BeautifulSoup, SoupStrainer
+except ImportError:
+    BeautifulSoup = None
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as file:
+        return file.read()
+
+
+def bs4_search(html):
+    first_article = BeautifulSoup(html, 'html.parser').find_all('article')[0]
+    link_elem = first_article.find('a')
+    img_elem = first_article.find('img')
+    return {
+        'url': link_elem.get('href'),
+        'title': link_elem.get('title') or link_elem.text.strip(),
+        'img_url': img_elem.get('src') if img_elem else None,
+    }
+
+
+def bs4_article(html):
+    content_div = BeautifulSoup(html, 'html.parser').find('div', class_='entry-content')
+    return " ".join(p.text.strip() for p in content_div.find_all('p')[:2])
+
+
+def strainer_search(html):
+    soup = BeautifulSoup(html, 'html.parser', parse_only=SoupStrainer('article'))
+    first_article = soup.find('article')
+    link_elem = first_article.find('a')
+    img_elem = first_article.find('img')
+    return {
+        'url': link_elem.get('href'),
+        'title': link_elem.get('title') or link_elem.text.strip(),
+        'img_url': img_elem.get('src') if img_elem else None,
+    }
+
+
+def strainer_article(html):
+    strainer = SoupStrainer('div', class_='entry-content')
+    content_div = BeautifulSoup(html, 'html.parser', parse_only=strainer).find('div')
+    return " ".join(p.text.strip() for p in content_div.find_all('p')[:2])
+
+
+def measure(func, html, iterations):
+    """Return (result, CPU ms per parse, peak KiB for one parse)"""
+    result = func(html)
+    start = time.process_time()
+    for _ in range(iterations):
+        func(html)
+    cpu_ms = (time.process_time() - start) * 1000 / iterations
+
+    tracemalloc.start()
+    func(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, cpu_ms, peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    cases = [
+        ('search', load_fixture('netflixlovers_search.html'), [
+            ('html_extract', parse_first_search_result),
+            ('bs4 full tree', bs4_search),
+            ('bs4 SoupStrainer', strainer_search),
+        ]),
+        ('article', load_fixture('netflixlovers_article.html'), [
+            ('html_extract', parse_article_description),
+            ('bs4 full tree', bs4_article),
+            ('bs4 SoupStrainer', strainer_article),
+        ]),
+    ]
+
+    print(f"{'page':<8} {'parser':<18} {'KiB in':>7} {'CPU ms':>8} {'peak KiB':>9}  same")
+    for page, html, parsers in cases:
+        expected = None
+        for name, func in parsers:
+            if BeautifulSoup is None and name.startswith('bs4'):
+                continue
+            result, cpu_ms, peak_kib = measure(func, html, args.iterations)
+            if expected is None:
+                expected = result
+            print(f"{page:<8} {name:<18} {len(html) / 1024:>7.1f} {cpu_ms:>8.3f} {peak_kib:>9.1f}  "
+                  f"{'yes' if result == expected else 'NO'}")
+    if BeautifulSoup is None:
+        print("beautifulsoup4 not installed: BeautifulSoup comparisons skipped")
+
+
+if __name__ == '__main__':
+    main()
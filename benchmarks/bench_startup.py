@@ -0,0 +1,64 @@
+"""
+Benchmark process startup: the time to import the web app and the importer
+CLI in a fresh interpreter, and which heavy dependencies each import loads.
+
+Usage: python benchmarks/bench_startup.py [--runs N]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ('openai', 'httpx', 'requests', 'urllib3', 'tiktoken', 'numpy', 'web_scraper')
+
+TARGETS = [
+    ('import app', 'import app'),
+    ('import import_watched_shows', 'import import_watched_shows'),
+]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': elapsed,
+    'loaded': [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+def run_once(statement, env):
+    code = PROBE.format(statement=statement, heavy=HEAVY_MODULES)
+    output = subprocess.run(
+        [sys.executable, '-c', code], cwd=ROOT, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time benchmark")
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='apicalendar-startup-')
+    env = dict(os.environ,
+               DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'startup.db')}",
+               LOG_LEVEL='WARNING')
+
+    print(f"{'target':<30} {'median ms':>10} {'min ms':>8} {'max ms':>8}  heavy modules loaded")
+    for name, statement in TARGETS:
+        results = [run_once(statement, env) for _ in range(args.runs)]
+        times = [result['seconds'] * 1000 for result in results]
+        loaded = ', '.join(results[-1]['loaded']) or '-'
+        print(f"{name:<30} {statistics.median(times):>10.1f} {min(times):>8.1f} {max(times):>8.1f}  {loaded}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+Local stand-ins for the OpenAI chat completions API and netflixlovers.it.
+
+Both servers run in background threads and are meant for offline benchmarks:
+latency, payload size and failure rate are configurable so changes to app.py
+and web_scraper.py can be measured without network access or paid calls.
+"""
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+ORIGINAL_HOST = 'https://www.netflixlovers.it'
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status, body, content_type):
+        body = body.encode('utf-8') if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubServer:
+    """Threaded HTTP server on a free local port"""
+
+    def __init__(self, handler_class):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler_class)
+        self.httpd.daemon_threads = True
+        self.httpd.stub = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class OpenAIStub(StubServer):
+    """
+    OpenAI-compatible POST /v1/chat/completions.
+    Every completion suggests shows_per_response new titles (unique per call,
+    so scraper caches don't hide the scraping cost) after latency seconds;
+    streamed completions spread that latency across the chunks.
+    """
+
+    def __init__(self, latency=1.0, shows_per_response=5, description_words=40):
+        super().__init__(_OpenAIHandler)
+        self.latency = latency
+        self.shows_per_response = shows_per_response
+        self.description_words = description_words
+        self.calls = 0
+        self._counter = itertools.count(1)
+
+    def completion_content(self):
+        call = next(self._counter)
+        shows = [{
+            'title': f'Serie Stub {call}-{index}',
+            'genre': 'Drama',
+            'description': ' '.join(['trama'] * self.description_words),
+            'release_date': '2026-01-01',
+            'similar_to': ['Dark'],
+            'image_url': 'https://image.tmdb.org/t/p/w500/stub.jpg',
+            'info_url': 'https://www.netflix.com/it/title/0',
+        } for index in range(self.shows_per_response)]
+        return json.dumps({'shows': shows})
+
+
+class _OpenAIHandler(_QuietHandler):
+    def do_POST(self):
+        stub = self.server.stub
+        length = int(self.headers.get('Content-Length') or 0)
+        request = json.loads(self.rfile.read(length) or b'{}')
+        stub.calls += 1
+        content = stub.completion_content()
+        model = request.get('model', 'gpt-4o')
+
+        if not request.get('stream'):
+            time.sleep(stub.latency)
+            self.send_body(200, json.dumps({
+                'id': 'chatcmpl-stub',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{
+                    'index': 0,
+                    'finish_reason': 'stop',
+                    'message': {'role': 'assistant', 'content': content},
+                }],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+            }), 'application/json')
+            return
+
+        pieces = [content[start:start + 40] for start in range(0, len(content), 40)]
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for piece in pieces:
+            time.sleep(stub.latency / len(pieces))
+            self._write_chunk('data: ' + json.dumps({
+                'id': 'chatcmpl-stub',
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}],
+            }) + '\n\n')
+        self._write_chunk('data: [DONE]\n\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _write_chunk(self, text):
+        data = text.encode('utf-8')
+        self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+
+
+class NetflixLoversStub(StubServer):
+    """
+    Serves the synthetic search and article pages from benchmarks/fixtures.
+    delay adds seconds to every response; failure_rate is the share of
+    requests answered with a 503; not_found_rate the share of searches
+    answered with an empty results page.
+    """
+
+    def __init__(self, delay=0.2, failure_rate=0.0, not_found_rate=0.0, seed=0):
+        super().__init__(_NetflixLoversHandler)
+        self.delay = delay
+        self.failure_rate = failure_rate
+        self.not_found_rate = not_found_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self._pages = {}
+
+    def page(self, name):
+        if name not in self._pages:
+            with open(os.path.join(FIXTURES, name), encoding='utf-8') as file:
+                self._pages[name] = file.read().replace(ORIGINAL_HOST, self.url)
+        return self._pages[name]
+
+
+class _NetflixLoversHandler(_QuietHandler):
+    def do_GET(self):
+        stub = self.server.stub
+        stub.requests += 1
+        time.sleep(stub.delay)
+        if stub.random.random() < stub.failure_rate:
+            self.send_body(503, 'Service Unavailable', 'text/plain')
+            return
+
+        parsed = urlparse(self.path)
+        if parsed.path == '/' and 's' in parse_qs(parsed.query):
+            if stub.random.random() < stub.not_found_rate:
+                page = '<html><body><p>Nessun risultato</p></body></html>'
+            else:
+                page = stub.page('netflixlovers_search.html')
+        else:
+            page = stub.page('netflixlovers_article.html')
+        self.send_body(200, page, 'text/html; charset=UTF-8')
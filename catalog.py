@@ -0,0 +1,281 @@
+"""
+Local copy of the Netflix Italia catalog with a fuzzy title index.
+
+Entries live in the netflix_catalog table and are filled from a file dump,
+from a crawl of Netflix Lovers listing pages (import_catalog.py) or by the
+scraper when a live lookup finds a show the catalog didn't have. Each
+process keeps an in-memory trigram index of the table so that verifying a
+title is a dictionary lookup instead of two HTTP requests.
+"""
+import logging
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, insert, update
+
+from models import db, CatalogEntry
+
+logger = logging.getLogger(__name__)
+
+# Rows changed by other processes are picked up with this much clock slack
+CLOCK_SLACK = timedelta(minutes=5)
+UPSERT_BATCH_SIZE = 500
+
+ENTRY_FIELDS = ('title', 'article_url', 'img_url', 'description', 'genre', 'source')
+
+
+def sanitize_title(title):
+    """Sanitize title for URL usage"""
+    # Remove special characters and replace spaces with dashes
+    return re.sub(r'[^a-zA-Z0-9\s-]', '', title).strip().replace(' ', '-').lower()
+
+
+def catalog_key(title):
+    """sanitize_title with accents folded first, so 'Élite' and 'Elite' match"""
+    decomposed = unicodedata.normalize('NFKD', title or '')
+    ascii_title = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return re.sub(r'-+', '-', sanitize_title(re.sub(r'\s+', ' ', ascii_title))).strip('-')
+
+
+def trigrams(key):
+    """Word trigrams of a catalog key, padded like PostgreSQL's pg_trgm"""
+    grams = set()
+    for word in key.split('-'):
+        if word:
+            padded = f' {word} '
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(grams, other):
+    """Share of trigrams in common, from 0 to 1"""
+    if not grams or not other:
+        return 0.0
+    shared = len(grams & other)
+    return shared / (len(grams) + len(other) - shared)
+
+
+def show_title_from_article(title):
+    """Strip the headline part of an article title ('Dark – La recensione' -> 'Dark')"""
+    return re.split(r'\s[–—|-]\s|:\s', title or '', maxsplit=1)[0].strip()
+
+
+def upsert_entries(entries):
+    """
+    Insert or update catalog entries (dicts with at least a title), keyed on
+    catalog_key(title). Returns (added, updated); the caller commits.
+    """
+    rows = {}
+    for entry in entries:
+        key = catalog_key(entry.get('title'))
+        if key:
+            row = {field: entry.get(field) for field in ENTRY_FIELDS}
+            row['title_key'] = key
+            rows[key] = row
+
+    added = updated = 0
+    keys = list(rows)
+    now = datetime.utcnow()
+    for start in range(0, len(keys), UPSERT_BATCH_SIZE):
+        chunk = keys[start:start + UPSERT_BATCH_SIZE]
+        existing = {
+            row.title_key: row.id
+            for row in db.session.execute(
+                select(CatalogEntry.id, CatalogEntry.title_key).where(CatalogEntry.title_key.in_(chunk))
+            )
+        }
+        new_rows = [dict(rows[key], updated_on=now) for key in chunk if key not in existing]
+        # Only overwrite the fields the entry actually provides
+        changed_rows = [
+            dict({field: rows[key][field] for field in ENTRY_FIELDS if rows[key][field] is not None},
+                 id=existing[key], updated_on=now)
+            for key in chunk if key in existing
+        ]
+        if new_rows:
+            db.session.execute(insert(CatalogEntry), new_rows)
+        if changed_rows:
+            db.session.execute(update(CatalogEntry), changed_rows)
+        added += len(new_rows)
+        updated += len(changed_rows)
+    return added, updated
+
+
+def known_title_keys(keys):
+    """Return the subset of catalog keys already in the catalog"""
+    keys = [key for key in keys if key]
+    if not keys:
+        return set()
+    return set(db.session.execute(
+        select(CatalogEntry.title_key).where(CatalogEntry.title_key.in_(keys))
+    ).scalars())
+
+
+class CatalogIndex:
+    """
+    In-memory trigram index over the netflix_catalog table.
+    Loaded on first use and kept current by reading only the rows updated
+    since the last refresh, at most once every refresh_interval seconds.
+    """
+
+    def __init__(self, min_score=0.45, refresh_interval=60):
+        self.min_score = min_score
+        self.refresh_interval = refresh_interval
+        self.app = None
+        self._entries = []
+        self._keys = []
+        self._grams = []
+        self._by_key = {}
+        self._postings = {}
+        self._loaded_until = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def init_app(self, app):
+        """Bind the index to a Flask app so it can read the database"""
+        self.app = app
+
+    def lookup(self, title, min_score=None):
+        """
+        Best catalog match for title as (entry, score), or None when nothing
+        scores at least min_score. An exact key match scores 1.0.
+        """
+        key = catalog_key(title)
+        if not key:
+            return None
+        self._refresh()
+        min_score = self.min_score if min_score is None else min_score
+
+        with self._lock:
+            position = self._by_key.get(key)
+            if position is not None:
+                return dict(self._entries[position]), 1.0
+
+            grams = trigrams(key)
+            if not grams:
+                return None
+            # A match scoring min_score shares at least that fraction of the
+            # query's trigrams, so it must contain one of its rarest ones:
+            # only those posting lists are read to find the candidates
+            required = max(math.ceil(min_score * len(grams)), 1)
+            rarest = sorted(grams, key=lambda gram: len(self._postings.get(gram, ())))
+            prefix = rarest[:len(grams) - required + 1]
+            counts = Counter()
+            for gram in prefix:
+                counts.update(self._postings.get(gram, ()))
+
+            # Check candidates with the most trigrams in common first and stop
+            # once even matching every remaining trigram couldn't do better
+            best, best_score = None, 0.0
+            unread = len(grams) - len(prefix)
+            for position, count in counts.most_common():
+                if (count + unread) / len(grams) <= best_score:
+                    break
+                score = similarity(grams, self._grams[position])
+                if score > best_score:
+                    best, best_score = position, score
+            if best is None or best_score < min_score:
+                return None
+            return dict(self._entries[best]), round(best_score, 3)
+
+    def add(self, entry):
+        """Store an entry (e.g. from a live lookup) in the table and the index"""
+        if self.app is None:
+            return
+        try:
+            with self.app.app_context():
+                upsert_entries([entry])
+                db.session.commit()
+        except Exception as e:
+            logger.error(f"Error storing catalog entry for {entry.get('title')}: {str(e)}")
+            return
+        with self._lock:
+            self._merge(catalog_key(entry.get('title')), {field: entry.get(field) for field in ENTRY_FIELDS})
+
+    def entries(self, start=0):
+        """(key, entry) copies for index positions from start on; positions never change"""
+        self._refresh()
+        with self._lock:
+            return [(self._keys[position], dict(self._entries[position]))
+                    for position in range(start, len(self._entries))]
+
+    def _refresh(self):
+        if self.app is None:
+            return
+        if self._checked_at is not None:
+            if time.monotonic() - self._checked_at < self.refresh_interval:
+                return
+            # Someone else is already refreshing; the current index is good enough
+            if not self._refresh_lock.acquire(blocking=False):
+                return
+        else:
+            self._refresh_lock.acquire()
+        try:
+            if self._checked_at is not None and time.monotonic() - self._checked_at < self.refresh_interval:
+                return
+            self._load_changes()
+        finally:
+            self._refresh_lock.release()
+
+    def _load_changes(self):
+        since = self._loaded_until - CLOCK_SLACK if self._loaded_until else None
+        started = time.perf_counter()
+        try:
+            with self.app.app_context():
+                # Plain tuples: building ORM objects would dominate a full load
+                query = select(CatalogEntry.title_key, CatalogEntry.updated_on,
+                               *[getattr(CatalogEntry, field) for field in ENTRY_FIELDS])
+                if since is not None:
+                    query = query.where(CatalogEntry.updated_on >= since)
+                loaded = [
+                    (row[0], dict(zip(ENTRY_FIELDS, row[2:])), row[1])
+                    for row in db.session.execute(query)
+                ]
+        except Exception as e:
+            logger.error(f"Error loading the Netflix catalog: {str(e)}")
+            self._checked_at = time.monotonic()
+            return
+
+        with self._lock:
+            for key, entry, updated_on in loaded:
+                self._merge(key, entry)
+                if updated_on and (self._loaded_until is None or updated_on > self._loaded_until):
+                    self._loaded_until = updated_on
+            size = len(self._entries)
+        self._checked_at = time.monotonic()
+        if since is None or loaded:
+            logger.info(
+                f"Catalog index: {len(loaded)} entries loaded in "
+                f"{(time.perf_counter() - started) * 1000:.0f} ms ({size} total)"
+            )
+
+    def _merge(self, key, entry):
+        # Called with self._lock held
+        if not key:
+            return
+        position = self._by_key.get(key)
+        if position is not None:
+            current = self._entries[position]
+            current.update({field: value for field, value in entry.items() if value is not None})
+            return
+        position = len(self._entries)
+        grams = trigrams(key)
+        self._entries.append(entry)
+        self._keys.append(key)
+        self._grams.append(grams)
+        self._by_key[key] = position
+        for gram in grams:
+            self._postings.setdefault(gram, []).append(position)
+
+
+# Shared index, bound to the database by app.create_app()
+netflix_catalog = CatalogIndex(
+    min_score=float(os.environ.get("CATALOG_MIN_SCORE", 0.45)),
+    refresh_interval=float(os.environ.get("CATALOG_REFRESH_INTERVAL", 60)),
+)
@@ -0,0 +1,73 @@
+import logging
+from datetime import datetime, timezone
+
+from flask import request, Response
+
+from models import db, CollectionVersion
+from recommendation_cache import invalidate_recommendations
+
+logger = logging.getLogger(__name__)
+
+WATCHED_SHOWS = 'watched_shows'
+
+
+def get_version(name):
+    """Return (version, updated_on) for a collection, (0, None) if never written"""
+    row = db.session.get(CollectionVersion, name)
+    if row is None:
+        return 0, None
+    return row.version, row.updated_on
+
+
+def bump_version(name):
+    """Increment a collection version; the caller commits"""
+    now = datetime.utcnow()
+    updated = db.session.query(CollectionVersion).filter_by(name=name).update(
+        {'version': CollectionVersion.version + 1, 'updated_on': now},
+        synchronize_session=False
+    )
+    if not updated:
+        db.session.add(CollectionVersion(name=name, version=1, updated_on=now))
+
+
+def watched_shows_changed():
+    """
+    Record a change to the watched list: bump its version and drop the
+    recommendations built from the old list. The caller commits.
+    """
+    bump_version(WATCHED_SHOWS)
+    invalidate_recommendations()
+
+
+def _http_time(value):
+    # HTTP dates have one-second resolution
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def not_modified_response(etag, updated_on):
+    """
+    Return a 304 response if the client's validators match, otherwise None.
+    """
+    last_modified = _http_time(updated_on)
+    if request.if_none_match:
+        matched = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and last_modified:
+        matched = last_modified <= request.if_modified_since
+    else:
+        matched = False
+    
+    if not matched:
+        return None
+    response = Response(status=304)
+    return set_validators(response, etag, updated_on)
+
+
+def set_validators(response, etag, updated_on):
+    """Attach ETag/Last-Modified and ask clients to revalidate every time"""
+    response.set_etag(etag, weak=True)
+    if updated_on is not None:
+        response.last_modified = _http_time(updated_on)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
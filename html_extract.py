@@ -0,0 +1,216 @@
+"""
+Targeted HTML extraction for Netflix Lovers pages.
+
+The scraper only needs the first search result and the first paragraphs of an
+article (and, when crawling the catalog, the articles of a listing page), so
+instead of building a full document tree these parsers walk the page with the
+standard library tokenizer and stop as soon as the needed elements have been
+seen.
+"""
+from html.parser import HTMLParser
+
+
+class _StopParsing(Exception):
+    """Raised from a handler once everything needed has been extracted"""
+
+
+class _TargetedParser(HTMLParser):
+    def run(self, html):
+        try:
+            self.feed(html or "")
+            self.close()
+        except _StopParsing:
+            pass
+        return self
+
+
+class FirstArticleParser(_TargetedParser):
+    """Collects the first link and image of the first <article> element"""
+
+    def __init__(self):
+        super().__init__()
+        self.found = False
+        self.link_url = None
+        self.link_title = None
+        self.img_url = None
+        self._article_depth = 0
+        self._in_link = False
+        self.link_seen = False
+        self._link_text = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'article':
+            self._article_depth += 1
+            self.found = True
+            return
+        if not self._article_depth:
+            return
+        if tag == 'a' and not self.link_seen:
+            attrs = dict(attrs)
+            self.link_seen = True
+            self._in_link = True
+            self.link_url = attrs.get('href')
+            self.link_title = attrs.get('title')
+        elif tag == 'img' and self.img_url is None:
+            self.img_url = dict(attrs).get('src') or None
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag == 'a':
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if not self._article_depth:
+            return
+        if tag == 'a' and self._in_link:
+            self._in_link = False
+        elif tag == 'article':
+            self._article_depth -= 1
+            if not self._article_depth:
+                raise _StopParsing()
+        if self.link_seen and not self._in_link and self.img_url is not None:
+            raise _StopParsing()
+
+    def handle_data(self, data):
+        if self._in_link:
+            self._link_text.append(data)
+
+    @property
+    def link_text(self):
+        return "".join(self._link_text).strip()
+
+
+class EntryContentParser(_TargetedParser):
+    """Collects the text of the first paragraphs inside div.entry-content"""
+
+    def __init__(self, max_paragraphs=2):
+        super().__init__()
+        self.max_paragraphs = max_paragraphs
+        self.paragraphs = []
+        self._div_depth = 0
+        self._current = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'div':
+            if self._div_depth:
+                self._div_depth += 1
+            elif 'entry-content' in (dict(attrs).get('class') or '').split():
+                self._div_depth = 1
+        elif tag == 'p' and self._div_depth:
+            # A new <p> implicitly closes an open one
+            self._finish_paragraph()
+            self._current = []
+
+    def handle_endtag(self, tag):
+        if not self._div_depth:
+            return
+        if tag == 'p':
+            self._finish_paragraph()
+        elif tag == 'div':
+            self._div_depth -= 1
+            if not self._div_depth:
+                self._finish_paragraph()
+                raise _StopParsing()
+
+    def handle_data(self, data):
+        if self._current is not None:
+            self._current.append(data)
+
+    def close(self):
+        super().close()
+        self._finish_paragraph()
+
+    def _finish_paragraph(self):
+        if self._current is not None:
+            self.paragraphs.append("".join(self._current).strip())
+            self._current = None
+            if len(self.paragraphs) >= self.max_paragraphs:
+                raise _StopParsing()
+
+
+def parse_first_search_result(html):
+    """
+    Return the first search result as {'url', 'title', 'img_url'},
+    or None if the page has no <article>.
+    """
+    parser = FirstArticleParser().run(html)
+    if not parser.found:
+        return None
+    return {
+        'url': parser.link_url if parser.link_seen else None,
+        'title': parser.link_title or parser.link_text,
+        'img_url': parser.img_url,
+    }
+
+
+def parse_article_description(html, max_paragraphs=2):
+    """Return the first paragraphs of the article body joined by spaces"""
+    parser = EntryContentParser(max_paragraphs).run(html)
+    return " ".join(parser.paragraphs)
+
+
+class ArticleListParser(_TargetedParser):
+    """Collects the first link and image of every <article> element"""
+
+    def __init__(self):
+        super().__init__()
+        self.articles = []
+        self._article_depth = 0
+        self._current = None
+        self._in_link = False
+        self._link_text = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'article':
+            self._article_depth += 1
+            if self._article_depth == 1:
+                self._current = {'url': None, 'title': None, 'img_url': None}
+                self._link_text = []
+            return
+        if not self._article_depth:
+            return
+        attrs = dict(attrs)
+        if tag == 'a' and self._current['url'] is None and not self._in_link:
+            self._in_link = True
+            self._current['url'] = attrs.get('href')
+            self._current['title'] = attrs.get('title')
+        elif tag == 'img' and self._current['img_url'] is None:
+            self._current['img_url'] = attrs.get('src') or None
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag == 'a':
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if not self._article_depth:
+            return
+        if tag == 'a' and self._in_link:
+            self._in_link = False
+        elif tag == 'article':
+            self._article_depth -= 1
+            if not self._article_depth:
+                self._finish_article()
+
+    def handle_data(self, data):
+        if self._in_link:
+            self._link_text.append(data)
+
+    def close(self):
+        super().close()
+        if self._article_depth:
+            self._finish_article()
+
+    def _finish_article(self):
+        article = self._current
+        self._current = None
+        self._in_link = False
+        self._article_depth = 0
+        if article and article['url']:
+            article['title'] = article['title'] or "".join(self._link_text).strip()
+            self.articles.append(article)
+
+
+def parse_article_list(html):
+    """Return every article on a listing page as {'url', 'title', 'img_url'}"""
+    return ArticleListParser().run(html).articles
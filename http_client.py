@@ -0,0 +1,118 @@
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised when a request is skipped because the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Simple thread-safe circuit breaker.
+    After failure_threshold consecutive failures the circuit opens and calls
+    are rejected for reset_timeout seconds; then a single trial call is let
+    through (half-open) and its outcome closes or reopens the circuit.
+    """
+    
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+    
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+    
+    def allow_request(self):
+        """Return True if a call may go through right now"""
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+    
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+    
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning("Circuit breaker opened after %d failures", self._failures)
+                self._opened_at = time.monotonic()
+
+
+class HttpClient:
+    """
+    Shared HTTP client with a pooled keep-alive session, separate connect and
+    read timeouts, bounded retries with backoff and a circuit breaker.
+    """
+    
+    def __init__(self, connect_timeout=3.05, read_timeout=8, retries=2,
+                 backoff_factor=0.3, pool_size=10, failure_threshold=5,
+                 reset_timeout=60, user_agent=None):
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.session = requests.Session()
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                              max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        if user_agent:
+            self.session.headers['User-Agent'] = user_agent
+    
+    def get(self, url, **kwargs):
+        """
+        GET url through the pooled session.
+        Raises CircuitOpenError without touching the network while the
+        circuit is open; 5xx responses and transport errors count as failures.
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpenError(f"Circuit open, skipping request to {url}")
+        kwargs.setdefault('timeout', self.timeout)
+        try:
+            response = self.session.get(url, **kwargs)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
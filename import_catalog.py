@@ -0,0 +1,87 @@
+import os
+import json
+import argparse
+import logging
+from app import app, db
+from catalog import upsert_entries
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", 500))
+CRAWL_PATH = os.environ.get("CATALOG_CRAWL_PATH", "")
+
+def iter_entries(file):
+    """
+    Yield catalog entries from a JSON Lines dump, one object per line with a
+    title and optionally article_url, img_url, description and genre.
+    Plain text lines are read as bare titles.
+    """
+    for number, line in enumerate(file, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('{'):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                logger.warning(f"Skipping invalid JSON on line {number}")
+                continue
+        else:
+            entry = {'title': line}
+        if entry.get('title'):
+            entry.setdefault('source', 'Catalogo Netflix Italia')
+            yield entry
+
+def import_dump(file_path, batch_size=DEFAULT_BATCH_SIZE):
+    """Stream a catalog dump into the netflix_catalog table in batches"""
+    logger.info(f"Reading catalog entries from: {file_path}")
+    try:
+        with app.app_context(), open(file_path, 'r', encoding='utf-8') as file:
+            batch = []
+            total_added = total_updated = 0
+            for entry in iter_entries(file):
+                batch.append(entry)
+                if len(batch) >= batch_size:
+                    added, updated = upsert_entries(batch)
+                    total_added += added
+                    total_updated += updated
+                    batch = []
+            if batch:
+                added, updated = upsert_entries(batch)
+                total_added += added
+                total_updated += updated
+            db.session.commit()
+            logger.info(f"Catalog import completed: {total_added} added, {total_updated} updated")
+    except Exception as e:
+        logger.error(f"Error importing catalog: {str(e)}")
+        raise
+
+def crawl(max_pages, path=CRAWL_PATH, full=False):
+    """Add the newest Netflix Lovers articles to the catalog"""
+    # The scraper stack is only needed for crawling
+    from web_scraper import crawl_catalog
+    with app.app_context():
+        pages, stored = crawl_catalog(max_pages=max_pages, path=path, full=full)
+    logger.info(f"Catalog crawl completed: {pages} pages read, {stored} entries stored")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill the local Netflix Italia catalog")
+    parser.add_argument('file_path', nargs='?', help="JSON Lines dump to import")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help="number of entries written per batch")
+    parser.add_argument('--crawl', action='store_true',
+                        help="crawl Netflix Lovers listing pages instead of reading a dump")
+    parser.add_argument('--pages', type=int, default=20, help="most listing pages to crawl")
+    parser.add_argument('--path', default=CRAWL_PATH, help="listing path to crawl, e.g. serie-tv")
+    parser.add_argument('--full', action='store_true',
+                        help="keep crawling past pages with no new articles")
+    args = parser.parse_args()
+
+    if args.crawl:
+        crawl(args.pages, path=args.path, full=args.full)
+    elif args.file_path:
+        import_dump(args.file_path, batch_size=args.batch_size)
+    else:
+        parser.error("a dump file or --crawl is required")
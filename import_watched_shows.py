@@ -1,66 +1,138 @@
 import os
 import re
+import argparse
 import logging
-from app import create_app, db, WatchedShow
+from sqlalchemy import insert, update, delete, select
+from app import app, db, WatchedShow
+from models import normalize_title
+from collection_version import watched_shows_changed
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def parse_file_and_import(file_path):
-    """Parse TV shows from file and import to database"""
+DEFAULT_FILE = 'attached_assets/serie_tv_viste_da_Luca.txt'
+DEFAULT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", 500))
+
+CATEGORY_RE = re.compile(r'^([A-Z /]+):$')
+SHOW_RE = re.compile(r'^- (.*?)$')
+
+def iter_shows(file):
+    """Yield (category, title) pairs from the file one line at a time"""
+    category = None
+    for line in file:
+        line = line.rstrip('\r\n')
+        category_match = CATEGORY_RE.match(line)
+        if category_match:
+            category = category_match.group(1).strip()
+            continue
+        show_match = SHOW_RE.match(line)
+        if show_match and category:
+            title = show_match.group(1).strip()
+            if title:  # Skip empty titles
+                yield category, title
+
+def _write_batch(batch, replace):
+    """Insert new titles and update changed categories; returns (added, updated)"""
+    keys = [row['title_key'] for row in batch]
+    existing = {}
+    if not replace:
+        existing = {
+            row.title_key: row
+            for row in db.session.execute(
+                select(WatchedShow.id, WatchedShow.title_key, WatchedShow.category)
+                .where(WatchedShow.title_key.in_(keys))
+            )
+        }
+
+    new_rows = [row for row in batch if row['title_key'] not in existing]
+    changed_rows = [
+        {'id': existing[row['title_key']].id, 'category': row['category']}
+        for row in batch
+        if row['title_key'] in existing and existing[row['title_key']].category != row['category']
+    ]
+    if new_rows:
+        db.session.execute(insert(WatchedShow), new_rows)
+    if changed_rows:
+        db.session.execute(update(WatchedShow), changed_rows)
+    return len(new_rows), len(changed_rows)
+
+def _prune_missing(seen_keys, batch_size):
+    """Delete shows whose title no longer appears in the file"""
+    stored = db.session.execute(select(WatchedShow.id, WatchedShow.title_key)).all()
+    missing = [row.id for row in stored if row.title_key not in seen_keys]
+    for start in range(0, len(missing), batch_size):
+        chunk = missing[start:start + batch_size]
+        db.session.execute(delete(WatchedShow).where(WatchedShow.id.in_(chunk)))
+    return len(missing)
+
+def parse_file_and_import(file_path, batch_size=DEFAULT_BATCH_SIZE, prune=False, replace=False):
+    """
+    Stream TV shows from file into the database in batches.
+    By default only new titles are inserted (and categories of existing ones
+    updated); prune also removes titles missing from the file, replace reloads
+    the whole table. Everything runs in one transaction, so live traffic never
+    sees a partially imported or empty list.
+    """
     logger.info(f"Reading TV shows from: {file_path}")
-    
+
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-        
-        # Split by category
-        categories = re.split(r'\n([A-Z /]+):\n', content)
-        
-        # First item is empty, skip it
-        categories = categories[1:]
-        
-        # Process each category
-        app = create_app()
-        with app.app_context():
-            # First, check and clear existing data if necessary
-            existing_count = db.session.query(WatchedShow).count()
-            if existing_count > 0:
-                logger.info(f"Found {existing_count} existing show records in database")
-                logger.info("Clearing existing data before reimporting...")
+        with app.app_context(), open(file_path, 'r', encoding='utf-8') as file:
+            if replace:
+                existing_count = db.session.query(WatchedShow).count()
+                logger.info(f"Replacing {existing_count} existing show records")
                 db.session.query(WatchedShow).delete()
-                db.session.commit()
-            
-            total_imported = 0
-            
-            for i in range(0, len(categories), 2):
-                if i+1 < len(categories):
-                    category_name = categories[i].strip()
-                    shows_text = categories[i+1]
-                    
-                    # Extract show titles
-                    show_titles = re.findall(r'- (.*?)$', shows_text, re.MULTILINE)
-                    
-                    for title in show_titles:
-                        title_stripped = title.strip()
-                        if title_stripped:  # Skip empty titles
-                            show = WatchedShow(
-                                title=title_stripped,
-                                category=category_name
-                            )
-                            db.session.add(show)
-                            total_imported += 1
-                    
-                    logger.info(f"Imported {len(show_titles)} shows from category {category_name}")
-                    
+
+            seen_keys = set()
+            batch = []
+            total_read = total_added = total_updated = 0
+
+            for category_name, title in iter_shows(file):
+                total_read += 1
+                title_key = normalize_title(title)
+                # Titles listed more than once keep their first category
+                if title_key in seen_keys:
+                    continue
+                seen_keys.add(title_key)
+                batch.append({'title': title, 'title_key': title_key, 'category': category_name})
+
+                if len(batch) >= batch_size:
+                    added, updated = _write_batch(batch, replace)
+                    total_added += added
+                    total_updated += updated
+                    batch = []
+
+            if batch:
+                added, updated = _write_batch(batch, replace)
+                total_added += added
+                total_updated += updated
+
+            total_removed = _prune_missing(seen_keys, batch_size) if prune and not replace else 0
+
+            if replace or total_added or total_updated or total_removed:
+                # Bump the list version and drop recommendations built from the old list
+                watched_shows_changed()
             db.session.commit()
-            logger.info(f"Import completed successfully! Total shows imported: {total_imported}")
-            
+            logger.info(
+                f"Import completed successfully! Read {total_read} shows: "
+                f"{total_added} added, {total_updated} updated, {total_removed} removed"
+            )
+
     except Exception as e:
         logger.error(f"Error importing shows: {str(e)}")
         raise
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import watched TV shows from a text file")
+    parser.add_argument('file_path', nargs='?', default=DEFAULT_FILE)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help="number of shows written per batch")
+    parser.add_argument('--prune', action='store_true',
+                        help="remove shows that are no longer in the file")
+    parser.add_argument('--replace', action='store_true',
+                        help="replace the whole list instead of syncing it")
+    args = parser.parse_args()
+
     # Import from the file
-    parse_file_and_import('attached_assets/serie_tv_viste_da_Luca.txt')
\ No newline at end of file
+    parse_file_and_import(args.file_path, batch_size=args.batch_size,
+                          prune=args.prune, replace=args.replace)
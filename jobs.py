@@ -0,0 +1,108 @@
+import json
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from models import db, RecommendationJob
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+
+class JobQueue:
+    """
+    Recommendation jobs run by a local thread pool.
+    Job state and results live in the recommendation_jobs table, so any web
+    worker can answer status and result requests. API keys are only kept in
+    memory by the process that runs the job.
+    """
+    
+    def __init__(self, max_workers=2, result_ttl=3600, timeout=300):
+        self.max_workers = max_workers
+        self.result_ttl = result_ttl
+        self.timeout = timeout
+        self.app = None
+        self._runner = None
+        self._error_message = str
+        self._executor = None
+        self._lock = threading.Lock()
+    
+    def init_app(self, app, runner, error_message=str):
+        """
+        Bind the queue to an app. runner(api_key, refresh, mode) returns the
+        result payload; error_message(exception) turns a failure into a message.
+        """
+        self.app = app
+        self._runner = runner
+        self._error_message = error_message
+    
+    def _get_executor(self):
+        # Created on first use so each forked web worker gets its own threads
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix='recommendation-job'
+                )
+            return self._executor
+    
+    def submit(self, api_key, refresh=False, mode=None):
+        """Store a queued job and hand it to the worker pool"""
+        self.purge_expired()
+        job = RecommendationJob(id=uuid.uuid4().hex, status=JOB_QUEUED, refresh=refresh, mode=mode)
+        db.session.add(job)
+        db.session.commit()
+        self._get_executor().submit(self._run, job.id, api_key, refresh, mode)
+        return job
+    
+    def get(self, job_id):
+        """Return a job that has not expired, or None"""
+        job = db.session.get(RecommendationJob, job_id)
+        now = datetime.utcnow()
+        if job is None or (job.expires_on and job.expires_on <= now):
+            return None
+        
+        # Jobs lost with a restarted worker would otherwise stay pending forever
+        if job.status in (JOB_QUEUED, JOB_RUNNING) and job.created_on \
+                and job.created_on + timedelta(seconds=self.timeout) <= now:
+            self._finish(job, error='Tempo scaduto per la richiesta')
+            db.session.commit()
+        return job
+    
+    def purge_expired(self):
+        """Delete finished jobs whose results are past their retention time"""
+        db.session.query(RecommendationJob).filter(
+            RecommendationJob.expires_on <= datetime.utcnow()
+        ).delete(synchronize_session=False)
+        db.session.commit()
+    
+    def _finish(self, job, result=None, error=None):
+        job.status = JOB_FAILED if error is not None else JOB_DONE
+        job.result = result
+        job.error = error
+        job.finished_on = datetime.utcnow()
+        job.expires_on = job.finished_on + timedelta(seconds=self.result_ttl)
+    
+    def _run(self, job_id, api_key, refresh, mode):
+        with self.app.app_context():
+            job = db.session.get(RecommendationJob, job_id)
+            if job is None or job.status != JOB_QUEUED:
+                return
+            job.status = JOB_RUNNING
+            job.started_on = datetime.utcnow()
+            db.session.commit()
+            
+            try:
+                result = self._runner(api_key, refresh, mode)
+                self._finish(job, result=json.dumps(result))
+            except Exception as e:
+                db.session.rollback()
+                job = db.session.get(RecommendationJob, job_id)
+                self._finish(job, error=self._error_message(e))
+            db.session.commit()
+            logger.info(f"Recommendation job {job_id} {job.status}")
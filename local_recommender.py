@@ -0,0 +1,275 @@
+"""
+Content-based recommendations computed locally from the Netflix catalog.
+
+Catalog entries and watched shows become TF-IDF vectors over their title,
+genre, category and description, and every candidate is scored against the
+watched-list profile with one matrix product. Vectors are kept between
+requests: new catalog entries and newly watched shows are vectorized as they
+appear, and the vocabulary is rebuilt only once the catalog has grown enough.
+
+NumPy is listed in requirements.txt but imported lazily; without it the
+local mode reports itself unavailable.
+"""
+import logging
+import math
+import re
+import threading
+from collections import Counter, namedtuple
+
+from sqlalchemy import select
+
+from catalog import catalog_key, trigrams, similarity
+from collection_version import WATCHED_SHOWS, get_version
+from models import db, WatchedShow
+from optional_import import optional_import
+from poster_cache import poster_cache
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'[^\W_]{3,}')
+STOPWORDS = frozenset("""
+    the and with from for that this una uno gli della delle degli dello nella nelle
+    negli sulla sulle con per che non del dei dal dai alla alle agli allo sua suo
+    suoi sue loro come quando dopo prima anche ancora tra fra più questo questa
+    stagione serie netflix
+""".split())
+
+# A vectorized watched show: its catalog match (key and score) and title trigrams
+_Watched = namedtuple('_Watched', ['row', 'vector', 'matched_key', 'score', 'grams'])
+
+
+class LocalRecommenderUnavailable(RuntimeError):
+    """The local mode can't run: NumPy missing, empty catalog or empty list"""
+
+
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall((text or '').casefold()) if token not in STOPWORDS]
+
+
+def show_document(title, genre=None, category=None, description=None):
+    """Tokens describing a show; genre and category count twice, as they say more than the plot"""
+    tags = ' '.join(filter(None, [genre, category]))
+    return tokenize(' '.join(filter(None, [title, tags, tags, description])))
+
+
+class LocalRecommender:
+    """
+    Scores catalog entries against the watched list.
+    max_features caps the vocabulary (and the width of the dense matrices);
+    the vocabulary and IDF weights are rebuilt when the catalog has grown by
+    more than rebuild_growth since they were computed.
+    """
+
+    def __init__(self, catalog, max_features=1024, rebuild_growth=0.25):
+        self.catalog = catalog
+        self.max_features = max_features
+        self.rebuild_growth = rebuild_growth
+        self._lock = threading.Lock()
+        self._vocabulary = None
+        self._idf = None
+        self._matrix = None
+        self._candidates = []
+        self._positions = {}
+        self._built_size = 0
+        self._watched = {}
+        self._watched_postings = {}
+        self._watched_version = None
+        self._watched_titles = []
+        self._watched_matrix = None
+        self._excluded = []
+
+    def available(self):
+        return optional_import('numpy') is not None
+
+    @property
+    def watched_count(self):
+        return len(self._watched)
+
+    def recommend(self, limit=5):
+        """
+        Top catalog entries for the current watched list, as shows in the
+        same shape the OpenAI pipeline returns. Needs an app context.
+        """
+        np = optional_import('numpy')
+        if not np:
+            raise LocalRecommenderUnavailable("NumPy non è installato: la modalità locale non è disponibile")
+
+        with self._lock:
+            new_entries = self._update_candidates(np)
+            if not self._candidates:
+                raise LocalRecommenderUnavailable("Il catalogo locale è vuoto")
+            self._update_watched(np, new_entries)
+            if not self._watched:
+                raise LocalRecommenderUnavailable("Nessuna serie vista su cui basare i consigli")
+
+            profile = self._watched_matrix.mean(axis=0)
+            scores = self._matrix @ profile
+            scores[self._excluded] = -1.0
+
+            count = min(limit, len(scores))
+            top = np.argpartition(-scores, count - 1)[:count]
+            top = top[np.argsort(-scores[top])]
+            top = top[scores[top] > 0]
+            # Watched shows closest to each pick, for similar_to
+            closest = self._matrix[top] @ self._watched_matrix.T
+
+            picks = []
+            for row, position in enumerate(top):
+                nearest = np.argsort(-closest[row])[:3]
+                similar_to = [self._watched_titles[i] for i in nearest if closest[row, i] > 0]
+                picks.append((self._candidates[position][1], float(scores[position]), similar_to))
+
+        return [self._show(entry, score, similar_to) for entry, score, similar_to in picks]
+
+    def _show(self, entry, score, similar_to):
+        from web_scraper import get_justwatch_url
+        title = entry['title']
+        description = entry.get('description') or ''
+        img_url = entry.get('img_url') or ''
+        show = {
+            'title': title,
+            'genre': entry.get('genre') or '',
+            'description': description,
+            'release_date': '',
+            'similar_to': similar_to,
+            'image_url': img_url,
+            'info_url': entry.get('article_url') or get_justwatch_url(title),
+            # Catalog entries are known to be on Netflix Italia
+            'verified': True,
+            'score': round(score, 3),
+        }
+        if len(description) > 10:
+            show['verified_description'] = description
+        if img_url.startswith('http'):
+            show['verified_image_url'] = img_url
+            poster_url = poster_cache.poster_url(img_url)
+            if poster_url:
+                show['poster_url'] = poster_url
+        return show
+
+    def _update_candidates(self, np):
+        """
+        Add new catalog entries. Returns the entries appended to the current
+        vectors; after a full rebuild every watched show is vectorized again
+        anyway, so none are returned.
+        """
+        new_entries = self.catalog.entries(len(self._candidates))
+        if not new_entries:
+            return []
+        total = len(self._candidates) + len(new_entries)
+        if self._vocabulary is None or total > self._built_size * (1 + self.rebuild_growth):
+            self._build(np, self._candidates + new_entries)
+            return []
+        rows = self._vectorize(np, [self._entry_document(entry) for _, entry in new_entries])
+        self._matrix = np.vstack([self._matrix, rows])
+        self._add_candidates(new_entries)
+        return new_entries
+
+    def _build(self, np, candidates):
+        documents = [self._entry_document(entry) for _, entry in candidates]
+        frequencies = Counter()
+        for document in documents:
+            frequencies.update(set(document))
+        vocabulary = [token for token, _ in frequencies.most_common(self.max_features)]
+        self._vocabulary = {token: column for column, token in enumerate(vocabulary)}
+        size = len(documents)
+        self._idf = np.array(
+            [math.log((1 + size) / (1 + frequencies[token])) + 1 for token in vocabulary],
+            dtype=np.float32
+        )
+        self._matrix = self._vectorize(np, documents)
+        self._candidates = []
+        self._positions = {}
+        self._add_candidates(candidates)
+        self._built_size = size
+        # Watched vectors belong to the old vocabulary
+        self._watched = {}
+        self._watched_postings = {}
+        self._watched_version = None
+        logger.info(f"Local recommender: {size} catalog entries, {len(vocabulary)} features")
+
+    def _add_candidates(self, candidates):
+        for key, entry in candidates:
+            self._positions[key] = len(self._candidates)
+            self._candidates.append((key, entry))
+
+    def _update_watched(self, np, new_entries=()):
+        """
+        Vectorize newly watched shows and drop removed ones. A new catalog
+        entry may match a show better than its current entry (and must then be
+        excluded from the picks): only the shows sharing a trigram with one of
+        new_entries are compared with it.
+        """
+        version = get_version(WATCHED_SHOWS)[0]
+        if version == self._watched_version and not new_entries:
+            return
+        # (row, catalog match or None) for every show to vectorize
+        matches = []
+        removed = False
+        if version != self._watched_version:
+            rows = db.session.execute(
+                select(WatchedShow.title_key, WatchedShow.title, WatchedShow.genre, WatchedShow.category)
+            ).all()
+            current = {row.title_key: row for row in rows}
+            for key in [key for key in self._watched if key not in current]:
+                for gram in self._watched.pop(key).grams:
+                    self._watched_postings[gram].discard(key)
+                removed = True
+            for key, row in current.items():
+                if key not in self._watched:
+                    matches.append((row, self.catalog.lookup(row.title)))
+        if new_entries and self._watched:
+            better = {}
+            for entry_key, entry in new_entries:
+                grams = trigrams(entry_key)
+                candidates = set()
+                for gram in grams:
+                    candidates.update(self._watched_postings.get(gram, ()))
+                for key in candidates:
+                    score = round(similarity(grams, self._watched[key].grams), 3)
+                    best = better[key][1] if key in better else self._watched[key].score
+                    if score >= self.catalog.min_score and score > best:
+                        better[key] = (entry, score)
+            matches += [(self._watched[key].row, match) for key, match in better.items()]
+
+        if matches:
+            documents = []
+            for row, match in matches:
+                # Borrow the description (and genre) of the catalog entry for this show
+                entry = match[0] if match else {}
+                documents.append(show_document(
+                    row.title, row.genre or entry.get('genre'), row.category, entry.get('description')
+                ))
+            vectors = self._vectorize(np, documents)
+            for (row, match), vector in zip(matches, vectors):
+                matched_key = catalog_key(match[0]['title']) if match else catalog_key(row.title)
+                grams = trigrams(catalog_key(row.title))
+                self._watched[row.title_key] = _Watched(row, vector, matched_key, match[1] if match else 0.0, grams)
+                for gram in grams:
+                    self._watched_postings.setdefault(gram, set()).add(row.title_key)
+
+        if self._watched and (matches or removed):
+            watched = list(self._watched.values())
+            self._watched_titles = [show.row.title for show in watched]
+            self._watched_matrix = np.vstack([show.vector for show in watched])
+        # New entries may be watched shows that had no match so far
+        self._excluded = [self._positions[show.matched_key] for show in self._watched.values()
+                          if show.matched_key in self._positions]
+        self._watched_version = version
+
+    def _entry_document(self, entry):
+        return show_document(entry.get('title'), entry.get('genre'), None, entry.get('description'))
+
+    def _vectorize(self, np, documents):
+        """L2-normalized TF-IDF rows for tokenized documents"""
+        matrix = np.zeros((len(documents), len(self._vocabulary)), dtype=np.float32)
+        for row, document in enumerate(documents):
+            counts = Counter(self._vocabulary[token] for token in document if token in self._vocabulary)
+            if counts:
+                columns = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+                frequencies = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+                matrix[row, columns] = 1 + np.log(frequencies)
+        matrix *= self._idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
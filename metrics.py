@@ -0,0 +1,138 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context
+
+# Latency buckets in seconds, from a cache hit to a slow OpenAI call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, counts):
+                    labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+                    lines.append(f'{self.name}_bucket{labels} {count}')
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+                lines.append(f'{self.name}_count{labels} {counts[-1]}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = REGISTRY.register(Histogram(
+    'apicalendar_request_duration_seconds', 'HTTP request latency by endpoint.',
+    ('endpoint', 'method', 'status')
+))
+STAGE_DURATION = REGISTRY.register(Histogram(
+    'apicalendar_stage_duration_seconds', 'Time spent in each processing stage.', ('stage',)
+))
+SCRAPE_RESULTS = REGISTRY.register(Counter(
+    'apicalendar_scrape_total',
+    'Netflix Lovers lookups by outcome (success, not_found, mismatch, failure, circuit_open, cancelled).',
+    ('result',)
+))
+UNVERIFIED_SHOWS = REGISTRY.register(Counter(
+    'apicalendar_unverified_shows_total', 'Recommended shows served unverified, with a JustWatch link.'
+))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    'apicalendar_cache_requests_total', 'Cache lookups by cache and result.', ('cache', 'result')
+))
+
+
+@contextmanager
+def timed(stage):
+    """
+    Time a block: recorded in the stage histogram and, when running inside
+    a request, in the Server-Timing breakdown for that request.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_DURATION.observe(elapsed, stage=stage)
+        if has_request_context():
+            timings = g.setdefault('server_timing', {})
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+def server_timing_header():
+    """Server-Timing value for the current request (durations in ms)"""
+    timings = g.get('server_timing') or {}
+    return ', '.join(f'{stage};dur={elapsed * 1000:.1f}' for stage, elapsed in timings.items())
@@ -0,0 +1,88 @@
+import logging
+
+from sqlalchemy import inspect, text
+
+from models import db, normalize_title
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def _add_title_key(connection):
+    """Add and backfill watched_shows.title_key, dropping duplicate titles"""
+    logger.info("Adding title_key column to watched_shows")
+    connection.execute(text("ALTER TABLE watched_shows ADD COLUMN title_key VARCHAR(255)"))
+    
+    rows = connection.execute(text("SELECT id, title FROM watched_shows ORDER BY id")).fetchall()
+    seen = set()
+    duplicates = []
+    updates = []
+    for row_id, title in rows:
+        key = normalize_title(title)
+        if key in seen:
+            duplicates.append(row_id)
+        else:
+            seen.add(key)
+            updates.append({'id': row_id, 'key': key})
+    
+    # Keep the oldest row for each title
+    for start in range(0, len(duplicates), BACKFILL_BATCH_SIZE):
+        batch = duplicates[start:start + BACKFILL_BATCH_SIZE]
+        connection.execute(text("DELETE FROM watched_shows WHERE id = :id"), [{'id': i} for i in batch])
+    if duplicates:
+        logger.warning(f"Removed {len(duplicates)} duplicate watched shows")
+    
+    for start in range(0, len(updates), BACKFILL_BATCH_SIZE):
+        connection.execute(
+            text("UPDATE watched_shows SET title_key = :key WHERE id = :id"),
+            updates[start:start + BACKFILL_BATCH_SIZE]
+        )
+    
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text("ALTER TABLE watched_shows ALTER COLUMN title_key SET NOT NULL"))
+
+
+def upgrade_watched_shows(engine):
+    """
+    Bring an existing watched_shows table up to the current schema.
+    Safe to run repeatedly; works on SQLite and PostgreSQL.
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table('watched_shows'):
+        return
+    columns = {column['name'] for column in inspector.get_columns('watched_shows')}
+    
+    with engine.begin() as connection:
+        if 'title_key' not in columns:
+            _add_title_key(connection)
+        
+        # Same names create_all() uses for new databases
+        connection.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_watched_shows_title_key ON watched_shows (title_key)"
+        ))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_watched_shows_category ON watched_shows (category)"
+        ))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_watched_shows_added_on ON watched_shows (added_on)"
+        ))
+
+
+def upgrade_recommendation_jobs(engine):
+    """Add the columns recommendation_jobs tables created by older versions lack"""
+    inspector = inspect(engine)
+    if not inspector.has_table('recommendation_jobs'):
+        return
+    columns = {column['name'] for column in inspector.get_columns('recommendation_jobs')}
+    if 'mode' not in columns:
+        logger.info("Adding mode column to recommendation_jobs")
+        with engine.begin() as connection:
+            connection.execute(text("ALTER TABLE recommendation_jobs ADD COLUMN mode VARCHAR(16)"))
+
+
+def upgrade_schema():
+    """Create missing tables and migrate existing ones; needs an app context"""
+    db.create_all()
+    upgrade_watched_shows(db.engine)
+    upgrade_recommendation_jobs(db.engine)
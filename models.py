@@ -1,17 +1,31 @@
+import re
+import unicodedata
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import validates
 
 # Initialize SQLAlchemy without binding to app yet
 db = SQLAlchemy()
 
+def normalize_title(title):
+    """Case- and whitespace-insensitive key used to detect duplicate titles"""
+    title = unicodedata.normalize('NFKC', title or '')
+    return re.sub(r'\s+', ' ', title).strip().casefold()
+
 class WatchedShow(db.Model):
     __tablename__ = 'watched_shows'
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
+    title_key = db.Column(db.String(255), nullable=False, unique=True, index=True)
     genre = db.Column(db.String(255))
-    category = db.Column(db.String(255))
-    added_on = db.Column(db.DateTime, default=datetime.utcnow)
+    category = db.Column(db.String(255), index=True)
+    added_on = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    @validates('title')
+    def _set_title_key(self, key, title):
+        self.title_key = normalize_title(title)
+        return title
     
     def __repr__(self):
         return f'<WatchedShow {self.title}>'
@@ -23,4 +37,85 @@ class WatchedShow(db.Model):
             'genre': self.genre,
             'category': self.category,
             'added_on': self.added_on.strftime('%Y-%m-%d %H:%M:%S') if self.added_on else None
-        }
\ No newline at end of file
+        }
+
+class NetflixLoversCache(db.Model):
+    __tablename__ = 'netflix_lovers_cache'
+    
+    key = db.Column(db.String(255), primary_key=True)
+    found = db.Column(db.Boolean, nullable=False, default=False)
+    data = db.Column(db.Text)
+    fetched_on = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_on = db.Column(db.DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<NetflixLoversCache {self.key}>'
+
+
+class CatalogEntry(db.Model):
+    __tablename__ = 'netflix_catalog'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(255), nullable=False)
+    title_key = db.Column(db.String(255), nullable=False, unique=True, index=True)
+    article_url = db.Column(db.String(512))
+    img_url = db.Column(db.String(512))
+    description = db.Column(db.Text)
+    genre = db.Column(db.String(255))
+    source = db.Column(db.String(64))
+    updated_on = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f'<CatalogEntry {self.title}>'
+
+
+class RecommendationCache(db.Model):
+    __tablename__ = 'recommendation_cache'
+    
+    key = db.Column(db.String(64), primary_key=True)
+    response = db.Column(db.Text, nullable=False)
+    created_on = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_on = db.Column(db.DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<RecommendationCache {self.key}>'
+
+
+class CollectionVersion(db.Model):
+    __tablename__ = 'collection_versions'
+    
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_on = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CollectionVersion {self.name}={self.version}>'
+
+
+class RecommendationJob(db.Model):
+    __tablename__ = 'recommendation_jobs'
+    
+    id = db.Column(db.String(32), primary_key=True)
+    status = db.Column(db.String(16), nullable=False, index=True)
+    refresh = db.Column(db.Boolean, default=False)
+    mode = db.Column(db.String(16))
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    created_on = db.Column(db.DateTime, default=datetime.utcnow)
+    started_on = db.Column(db.DateTime)
+    finished_on = db.Column(db.DateTime)
+    expires_on = db.Column(db.DateTime, index=True)
+    
+    def __repr__(self):
+        return f'<RecommendationJob {self.id} {self.status}>'
+    
+    def to_dict(self):
+        fmt = '%Y-%m-%d %H:%M:%S'
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'error': self.error,
+            'created_on': self.created_on.strftime(fmt) if self.created_on else None,
+            'started_on': self.started_on.strftime(fmt) if self.started_on else None,
+            'finished_on': self.finished_on.strftime(fmt) if self.finished_on else None
+        }
@@ -0,0 +1,45 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+
+def _fingerprint(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class ClientCache:
+    """
+    Bounded LRU of OpenAI clients keyed by API key, so each key keeps its
+    connection pool across requests. Evicted clients are only dropped, not
+    closed: another thread may still be using one, and its connection pool
+    is closed when the client is garbage-collected.
+    """
+    
+    def __init__(self, max_size=16):
+        self.max_size = max_size
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, api_key):
+        key = _fingerprint(api_key)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                # Imported here so processes that never call OpenAI don't load it
+                from openai import OpenAI
+                client = OpenAI(api_key=api_key)
+                self._clients[key] = client
+            self._clients.move_to_end(key)
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+        return client
+
+
+def request_fingerprint(api_key, model, messages):
+    """Key for coalescing: same API key, model and prompt"""
+    return _fingerprint(api_key, model, json.dumps(messages, sort_keys=True))
@@ -0,0 +1,24 @@
+import importlib
+import threading
+
+_modules = {}
+_lock = threading.Lock()
+
+
+def optional_import(name):
+    """
+    Import a module (e.g. 'numpy' or 'PIL.Image') on first use and return it,
+    or None when it is not installed. Both outcomes are remembered, so callers
+    can check for the module on every request.
+    """
+    try:
+        return _modules[name]
+    except KeyError:
+        pass
+    with _lock:
+        if name not in _modules:
+            try:
+                _modules[name] = importlib.import_module(name)
+            except ImportError:
+                _modules[name] = None
+        return _modules[name]
@@ -0,0 +1,249 @@
+"""
+Disk cache and resizing proxy for poster images.
+
+Each remote poster is downloaded once, stored on disk together with its
+resized variants and served from there. The cache directory is bounded by
+size, evicting the least recently served files first. Proxy URLs are signed
+with the app secret, so only posters the app itself linked can be fetched.
+
+Resizing and checking downloads need Pillow (in requirements.txt, imported
+lazily); without it the original image is served at every width.
+"""
+import hashlib
+import hmac
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from urllib.parse import urlencode, urlparse
+
+from metrics import CACHE_REQUESTS, timed
+from optional_import import optional_import
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {'image/jpeg': '.jpg', 'image/png': '.png', 'image/webp': '.webp', 'image/gif': '.gif'}
+CONTENT_TYPES = {extension: content_type for content_type, extension in EXTENSIONS.items()}
+
+Poster = namedtuple('Poster', ['path', 'etag', 'content_type'])
+
+
+class PosterError(Exception):
+    """A poster that can't be served; status is the HTTP status to answer with"""
+
+    def __init__(self, message, status=502):
+        super().__init__(message)
+        self.status = status
+
+
+class PosterCache:
+    """
+    Size-bounded LRU cache of poster files. Files are named after a hash of
+    the remote URL and the variant width; the recency order is kept in
+    memory and mirrored in the files' modification times, so it survives
+    restarts. Each worker process accounts for the files it knows about.
+    """
+
+    def __init__(self, directory=None, max_bytes=200 * 1024 * 1024, max_download=5 * 1024 * 1024,
+                 widths=(160, 320, 640), default_width=320):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_download = max_download
+        self.widths = tuple(sorted(widths))
+        self.default_width = default_width
+        self._secret = None
+        self._client = None
+        self._files = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._downloads = SingleFlight()
+
+    def init_app(self, app):
+        """Sign URLs with the app secret and index the files already on disk"""
+        self._secret = str(app.secret_key).encode('utf-8')
+        self.directory = self.directory or os.path.join(app.instance_path, 'posters')
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            self._files.clear()
+            self._size = 0
+            entries = [entry for entry in os.scandir(self.directory)
+                       if entry.is_file() and os.path.splitext(entry.name)[1] in CONTENT_TYPES]
+            for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime):
+                self._remember(entry.name, entry.stat().st_size)
+
+    def sign(self, url):
+        return hmac.new(self._secret, url.encode('utf-8'), hashlib.sha256).hexdigest()[:32]
+
+    def poster_url(self, url, width=None):
+        """Proxy URL for a remote poster, or None if it can't be proxied"""
+        if self._secret is None or not url or urlparse(url).scheme not in ('http', 'https'):
+            return None
+        return '/posters?' + urlencode({'url': url, 'w': width or self.default_width, 'sig': self.sign(url)})
+
+    def variant_width(self, width):
+        """Round a requested width up to a stored variant; None keeps the original"""
+        if not width:
+            return None
+        for allowed in self.widths:
+            if width <= allowed:
+                return allowed
+        return self.widths[-1]
+
+    def get(self, url, width, signature):
+        """Return the Poster for url at width, downloading and resizing it on a miss"""
+        if self._secret is None:
+            raise PosterError('Cache delle locandine non configurata', 503)
+        if not hmac.compare_digest(self.sign(url), signature or ''):
+            raise PosterError('Firma non valida', 403)
+        if urlparse(url).scheme not in ('http', 'https'):
+            raise PosterError('URL non valido', 400)
+
+        # Without Pillow every width is served by the original
+        width = self.variant_width(width) if optional_import('PIL.Image') else None
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()[:32]
+        name = f"{key}-{width or 'orig'}"
+        poster = self._find(name)
+        if poster is not None:
+            CACHE_REQUESTS.inc(cache="posters", result="hit")
+            return poster
+        CACHE_REQUESTS.inc(cache="posters", result="miss")
+        # Concurrent requests for the same variant share one download
+        return self._downloads.do(name, lambda: self._create(url, key, width))
+
+    def _create(self, url, key, width):
+        original = self._find(f"{key}-orig") or self._download(url, key)
+        if width is None:
+            return original
+
+        Image = optional_import('PIL.Image')
+        try:
+            with timed("poster_resize"):
+                with Image.open(original.path) as image:
+                    if image.width <= width:
+                        return original
+                    image.thumbnail((width, width * 10))
+                    if image.mode in ('RGBA', 'LA', 'P'):
+                        content_type = 'image/png'
+                        image_format = 'PNG'
+                    else:
+                        content_type = 'image/jpeg'
+                        image_format = 'JPEG'
+                        image = image.convert('RGB')
+                    buffer = io.BytesIO()
+                    image.save(buffer, image_format, optimize=True, **({'quality': 85} if image_format == 'JPEG' else {}))
+        except Exception as e:
+            # A file that can't be decoded is useless at any width
+            logger.warning(f"Error resizing poster {url}: {str(e)}")
+            self._discard(original)
+            raise PosterError('Immagine non valida')
+        return self._write(f"{key}-{width}", content_type, buffer.getvalue())
+
+    def _download(self, url, key):
+        if self._client is None:
+            # Same HTTP layer as the scraper, with its own circuit breaker
+            from http_client import HttpClient
+            self._client = HttpClient(connect_timeout=3.05, read_timeout=10, retries=1)
+        try:
+            with timed("poster_download"):
+                # A redirect could lead anywhere, so only the signed URL is fetched;
+                # the body is streamed so max_download also bounds memory
+                with self._client.get(url, allow_redirects=False, stream=True) as response:
+                    content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+                    if response.status_code != 200 or content_type not in EXTENSIONS:
+                        logger.warning(
+                            f"Poster {url} answered {response.status_code} ({content_type or 'no content type'})"
+                        )
+                        raise PosterError('Immagine non disponibile')
+                    length = response.headers.get('Content-Length', '')
+                    if length.isdigit() and int(length) > self.max_download:
+                        raise PosterError('Immagine troppo grande')
+                    data = bytearray()
+                    for chunk in response.iter_content(64 * 1024):
+                        data += chunk
+                        if len(data) > self.max_download:
+                            raise PosterError('Immagine troppo grande')
+        except PosterError:
+            raise
+        except Exception as e:
+            logger.warning(f"Error downloading poster {url}: {str(e)}")
+            raise PosterError('Immagine non disponibile')
+        return self._write(f"{key}-orig", content_type, bytes(data), verify=True)
+
+    def _write(self, name, content_type, data, verify=False):
+        """Store data under name; with verify, Pillow must accept it as an image first"""
+        filename = name + EXTENSIONS[content_type]
+        path = os.path.join(self.directory, filename)
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, 'wb') as file:
+            file.write(data)
+        Image = optional_import('PIL.Image') if verify else None
+        if Image:
+            try:
+                with Image.open(temporary) as image:
+                    image.verify()
+            except Exception as e:
+                logger.warning(f"Poster {name} is not a valid image: {str(e)}")
+                os.remove(temporary)
+                raise PosterError('Immagine non valida')
+        os.replace(temporary, path)
+        with self._lock:
+            self._remember(filename, len(data))
+            self._evict()
+        return Poster(path, name, content_type)
+
+    def _discard(self, poster):
+        filename = os.path.basename(poster.path)
+        with self._lock:
+            self._size -= self._files.pop(filename, 0)
+        try:
+            os.remove(poster.path)
+        except FileNotFoundError:
+            pass
+
+    def _find(self, name):
+        """The stored file for name, also picking up files written by other workers"""
+        with self._lock:
+            for extension, content_type in CONTENT_TYPES.items():
+                filename = name + extension
+                path = os.path.join(self.directory, filename)
+                if filename in self._files:
+                    self._files.move_to_end(filename)
+                elif os.path.exists(path):
+                    self._remember(filename, os.path.getsize(path))
+                else:
+                    continue
+                try:
+                    os.utime(path)
+                except FileNotFoundError:
+                    # Evicted by another worker
+                    self._size -= self._files.pop(filename)
+                    return None
+                return Poster(path, name, content_type)
+        return None
+
+    def _remember(self, filename, size):
+        self._size += size - self._files.get(filename, 0)
+        self._files[filename] = size
+        self._files.move_to_end(filename)
+
+    def _evict(self):
+        # Keep the newest file even if it alone is over the limit
+        while self._size > self.max_bytes and len(self._files) > 1:
+            filename, size = self._files.popitem(last=False)
+            self._size -= size
+            try:
+                os.remove(os.path.join(self.directory, filename))
+            except FileNotFoundError:
+                pass
+            logger.info(f"Evicted poster {filename}")
+
+
+# Shared poster cache, bound to the app (secret and directory) by app.create_app()
+poster_cache = PosterCache(
+    directory=os.environ.get("POSTER_CACHE_DIR") or None,
+    max_bytes=int(float(os.environ.get("POSTER_CACHE_MAX_MB", 200)) * 1024 * 1024),
+    widths=tuple(int(width) for width in os.environ.get("POSTER_WIDTHS", "160,320,640").split(',')),
+    default_width=int(os.environ.get("POSTER_DEFAULT_WIDTH", 320)),
+)
@@ -0,0 +1,153 @@
+import logging
+import threading
+from collections import Counter, namedtuple
+
+from sqlalchemy import select
+
+from models import db, WatchedShow
+from optional_import import optional_import
+
+logger = logging.getLogger(__name__)
+
+# Share of the budget (after the category summary) used for recent titles
+RECENT_SHARE = 0.35
+# Spreads picks evenly across a category without randomness
+_GOLDEN_RATIO = 0.6180339887498949
+
+TasteProfile = namedtuple('TasteProfile', ['text', 'tokens', 'titles', 'compact'])
+
+
+_encodings = {}
+
+def count_tokens(text, model='gpt-4o'):
+    """Count tokens with tiktoken when available, otherwise estimate them"""
+    tiktoken = optional_import('tiktoken')
+    if not tiktoken:
+        # Roughly four characters per token for Latin-script text
+        return (len(text) + 3) // 4
+    encoding = _encodings.get(model)
+    if encoding is None:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding('o200k_base')
+        _encodings[model] = encoding
+    return len(encoding.encode(text))
+
+
+def _spread(titles):
+    """Order titles so that any prefix is spread across the whole list"""
+    ordered = sorted(titles, key=str.casefold)
+    return [title for _, title in sorted(
+        ((index * _GOLDEN_RATIO) % 1, title) for index, title in enumerate(ordered)
+    )]
+
+
+def _round_robin(groups):
+    """Take one title from each group in turn until all are exhausted"""
+    iterators = [iter(group) for group in groups]
+    while iterators:
+        for iterator in list(iterators):
+            try:
+                yield next(iterator)
+            except StopIteration:
+                iterators.remove(iterator)
+
+
+def _take_within(titles, budget, model):
+    """Take titles in order while their comma-separated list fits the budget"""
+    taken = []
+    used = 0
+    for title in titles:
+        cost = count_tokens(title, model) + 1  # plus the ", " separator
+        if used + cost > budget:
+            break
+        taken.append(title)
+        used += cost
+    return taken
+
+
+def build_taste_profile(rows, budget, model='gpt-4o'):
+    """
+    Describe the watched list within a token budget.
+    rows are (title, category, added_on) tuples. Small lists are sent in full;
+    larger ones become per-category counts, the most recent titles and a
+    representative sample of each category.
+    """
+    titles = [row[0] for row in rows]
+    full_text = "le serie TV che ho già visto: " + ", ".join(titles)
+    full_tokens = count_tokens(full_text, model)
+    if full_tokens <= budget:
+        return TasteProfile(full_text, full_tokens, titles, False)
+
+    counts = Counter(row[1] or 'ALTRE' for row in rows)
+    header = (
+        f"il mio storico di {len(rows)} serie TV viste "
+        f"(per categoria: {', '.join(f'{category} {count}' for category, count in counts.most_common())})"
+    )
+    remaining = max(budget - count_tokens(header, model), 0)
+
+    by_recency = sorted(rows, key=lambda row: (row[2] is not None, row[2]), reverse=True)
+    recent = _take_within([row[0] for row in by_recency], int(remaining * RECENT_SHARE), model)
+    recent_set = set(recent)
+
+    groups = {}
+    for title, category, _ in rows:
+        if title not in recent_set:
+            groups.setdefault(category or 'ALTRE', []).append(title)
+    ordered_groups = [_spread(groups[category]) for category, _ in counts.most_common() if category in groups]
+    sample = _take_within(
+        _round_robin(ordered_groups),
+        remaining - sum(count_tokens(title, model) + 1 for title in recent),
+        model
+    )
+
+    def render():
+        parts = [header]
+        if recent:
+            parts.append("le più recenti: " + ", ".join(recent))
+        if sample:
+            parts.append("altre rappresentative: " + ", ".join(sample))
+        return "; ".join(parts)
+
+    # The per-title costs are an estimate; trim until the whole text fits
+    text = render()
+    tokens = count_tokens(text, model)
+    while tokens > budget and (sample or recent):
+        (sample or recent).pop()
+        text = render()
+        tokens = count_tokens(text, model)
+    return TasteProfile(text, tokens, titles, True)
+
+
+class TasteProfileCache:
+    """
+    Keeps the profile for the latest watched-list version, so the list is only
+    read and compacted again after it changes.
+    """
+
+    def __init__(self, budget, model='gpt-4o'):
+        self.budget = budget
+        self.model = model
+        self._version = None
+        self._profile = None
+        self._lock = threading.Lock()
+
+    def get(self, version):
+        """Return the profile for this collection version; needs an app context"""
+        with self._lock:
+            if self._profile is not None and self._version == version:
+                return self._profile
+
+        rows = db.session.execute(
+            select(WatchedShow.title, WatchedShow.category, WatchedShow.added_on)
+        ).all()
+        profile = build_taste_profile([tuple(row) for row in rows], self.budget, self.model)
+        logger.info(
+            f"Built taste profile for {len(rows)} shows: {profile.tokens} tokens"
+            f"{' (compacted)' if profile.compact else ''}"
+        )
+        with self._lock:
+            self._version = version
+            self._profile = profile
+        return profile
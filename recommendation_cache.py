@@ -0,0 +1,71 @@
+import hashlib
+import logging
+import os
+from datetime import datetime, timedelta
+
+from models import db, RecommendationCache
+from metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# How long (seconds) a generated set of recommendations is reused
+RECOMMENDATION_CACHE_TTL = int(os.environ.get("RECOMMENDATION_CACHE_TTL", 6 * 3600))
+
+
+def recommendation_key(watched_titles, model, day=None):
+    """Fingerprint of the sorted watched titles, the model name and the date"""
+    day = day or datetime.now().strftime("%Y-%m-%d")
+    digest = hashlib.sha256()
+    for part in [model, day] + sorted(watched_titles):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def get_cached_recommendation(key):
+    """Return the cached response for key, or None if missing or expired"""
+    try:
+        entry = db.session.get(RecommendationCache, key)
+        if entry is None:
+            CACHE_REQUESTS.inc(cache="recommendations", result="miss")
+            return None
+        if entry.expires_on <= datetime.utcnow():
+            db.session.delete(entry)
+            db.session.commit()
+            CACHE_REQUESTS.inc(cache="recommendations", result="miss")
+            return None
+        CACHE_REQUESTS.inc(cache="recommendations", result="hit")
+        return entry.response
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error reading recommendation cache: {str(e)}")
+        return None
+
+
+def store_recommendation(key, response, ttl=None):
+    """Cache a processed recommendation response under key"""
+    ttl = RECOMMENDATION_CACHE_TTL if ttl is None else ttl
+    now = datetime.utcnow()
+    try:
+        entry = db.session.get(RecommendationCache, key)
+        if entry is None:
+            entry = RecommendationCache(key=key)
+            db.session.add(entry)
+        entry.response = response
+        entry.created_on = now
+        entry.expires_on = now + timedelta(seconds=ttl)
+        db.session.query(RecommendationCache).filter(
+            RecommendationCache.expires_on <= now
+        ).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error writing recommendation cache: {str(e)}")
+
+
+def invalidate_recommendations():
+    """
+    Drop every cached recommendation.
+    Called whenever the watched list changes; the caller commits.
+    """
+    db.session.query(RecommendationCache).delete(synchronize_session=False)
@@ -0,0 +1,110 @@
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from models import db, NetflixLoversCache
+
+logger = logging.getLogger(__name__)
+
+# Returned by ScrapeCache.get when nothing usable is cached
+MISSING = object()
+
+
+class ScrapeCache:
+    """
+    In-process LRU cache for Netflix Lovers lookups, backed by the
+    netflix_lovers_cache table so entries survive worker restarts.
+    Misses (show not found) are cached too, with their own shorter TTL.
+    """
+    
+    def __init__(self, max_size=512, hit_ttl=3 * 24 * 3600, miss_ttl=6 * 3600):
+        self.max_size = max_size
+        self.hit_ttl = hit_ttl
+        self.miss_ttl = miss_ttl
+        self.app = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def init_app(self, app):
+        """Bind the cache to a Flask app so it can use the database"""
+        self.app = app
+    
+    def get(self, key):
+        """Return the cached value for key (None for a cached miss) or MISSING"""
+        now = datetime.utcnow()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_on = entry
+                if expires_on > now:
+                    self._entries.move_to_end(key)
+                    return value
+                del self._entries[key]
+        
+        entry = self._load(key, now)
+        if entry is None:
+            return MISSING
+        with self._lock:
+            self._remember(key, *entry)
+        return entry[0]
+    
+    def set(self, key, value):
+        """Cache value for key; a None value is stored as a negative entry"""
+        ttl = self.hit_ttl if value is not None else self.miss_ttl
+        now = datetime.utcnow()
+        expires_on = now + timedelta(seconds=ttl)
+        with self._lock:
+            self._remember(key, value, expires_on)
+        self._store(key, value, now, expires_on)
+    
+    def _remember(self, key, value, expires_on):
+        self._entries[key] = (value, expires_on)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def _load(self, key, now):
+        if self.app is None:
+            return None
+        try:
+            with self.app.app_context():
+                row = db.session.get(NetflixLoversCache, key)
+                if row is None or row.expires_on <= now:
+                    return None
+                value = json.loads(row.data) if row.found and row.data else None
+                return value, row.expires_on
+        except Exception as e:
+            logger.error(f"Error reading scrape cache for {key}: {str(e)}")
+            return None
+    
+    def _store(self, key, value, now, expires_on):
+        if self.app is None:
+            return
+        try:
+            with self.app.app_context():
+                row = db.session.get(NetflixLoversCache, key)
+                if row is None:
+                    row = NetflixLoversCache(key=key)
+                    db.session.add(row)
+                row.found = value is not None
+                row.data = json.dumps(value) if value is not None else None
+                row.fetched_on = now
+                row.expires_on = expires_on
+                # Keep the table bounded by dropping expired entries
+                db.session.query(NetflixLoversCache).filter(
+                    NetflixLoversCache.expires_on <= now
+                ).delete(synchronize_session=False)
+                db.session.commit()
+        except Exception as e:
+            logger.error(f"Error writing scrape cache for {key}: {str(e)}")
+
+
+# Cache for Netflix Lovers lookups, bound to the database by app.create_app()
+netflix_cache = ScrapeCache(
+    max_size=int(os.environ.get("NETFLIX_CACHE_SIZE", 512)),
+    hit_ttl=int(os.environ.get("NETFLIX_CACHE_HIT_TTL", 3 * 24 * 3600)),
+    miss_ttl=int(os.environ.get("NETFLIX_CACHE_MISS_TTL", 6 * 3600)),
+)
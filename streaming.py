@@ -0,0 +1,54 @@
+import json
+
+
+def sse_event(event, data):
+    """Format a Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class ShowStreamParser:
+    """
+    Incremental parser for the model's JSON output.
+    Text chunks are fed as they arrive from the OpenAI stream and every show
+    object of the top-level array (e.g. {"shows": [{...}, {...}]}) is
+    returned as soon as its closing brace has been received.
+    """
+    
+    def __init__(self):
+        self.text = ""
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._object_start = None
+    
+    def feed(self, chunk):
+        """Add a chunk of text and return the show objects it completed"""
+        completed = []
+        offset = len(self.text)
+        self.text += chunk
+        for position, char in enumerate(chunk, start=offset):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                if char == '{' and self._stack == ['{', '[']:
+                    self._object_start = position
+                self._stack.append(char)
+            elif char in '}]':
+                if self._stack:
+                    self._stack.pop()
+                if char == '}' and self._stack == ['{', '['] and self._object_start is not None:
+                    try:
+                        completed.append(json.loads(self.text[self._object_start:position + 1]))
+                    except json.JSONDecodeError:
+                        pass
+                    self._object_start = None
+        return completed
@@ -0,0 +1,114 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import select, and_, or_
+
+from models import db, WatchedShow, normalize_title
+
+FIELDS = ('id', 'title', 'genre', 'category', 'added_on')
+ORDERS = ('id', 'added_on')
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError('Cursore non valido')
+    if not isinstance(values, dict) or not isinstance(values.get('id'), int):
+        raise ValueError('Cursore non valido')
+    return values
+
+
+def parse_fields(fields):
+    """Validate a comma-separated field list; None means every field"""
+    if not fields:
+        return FIELDS
+    selected = tuple(field.strip() for field in fields.split(',') if field.strip())
+    unknown = [field for field in selected if field not in FIELDS]
+    if unknown:
+        raise ValueError(f"Campi non validi: {', '.join(unknown)}")
+    return selected
+
+
+def _format_added_on(value):
+    # Same format as WatchedShow.to_dict, without strftime
+    return value.isoformat(sep=' ', timespec='seconds') if value else None
+
+
+def list_watched_shows(limit, cursor=None, category=None, title_prefix=None, fields=None, order='id'):
+    """
+    One page of watched shows using keyset pagination (every show if limit is None).
+    order='id' pages by ascending id, order='added_on' by most recently added
+    (rows from before added_on existed, where it is NULL, come last).
+    Rows are read as plain tuples with only the requested columns.
+    Returns (shows, next_cursor); next_cursor is None on the last page.
+    """
+    if order not in ORDERS:
+        raise ValueError(f"Ordinamento non valido: {order}")
+    fields = parse_fields(fields)
+
+    # id and added_on are always read because the cursor is built from them
+    columns = [WatchedShow.id, WatchedShow.added_on] + [
+        getattr(WatchedShow, field) for field in fields if field not in ('id', 'added_on')
+    ]
+    query = select(*columns)
+
+    if category:
+        query = query.where(WatchedShow.category == category)
+    if title_prefix:
+        # Prefix match on the normalized title; a range with an upper bound
+        # like prefix + '\uffff' depends on the collation
+        prefix = normalize_title(title_prefix)
+        query = query.where(WatchedShow.title_key.startswith(prefix, autoescape=True))
+
+    position = decode_cursor(cursor) if cursor else None
+    if order == 'id':
+        if position:
+            query = query.where(WatchedShow.id > position['id'])
+        query = query.order_by(WatchedShow.id)
+    else:
+        if position and position.get('added_on') is None:
+            # Already among the rows without added_on
+            query = query.where(WatchedShow.added_on.is_(None), WatchedShow.id < position['id'])
+        elif position:
+            try:
+                added_on = datetime.fromisoformat(position['added_on'])
+            except (TypeError, ValueError):
+                raise ValueError('Cursore non valido')
+            query = query.where(or_(
+                WatchedShow.added_on < added_on,
+                and_(WatchedShow.added_on == added_on, WatchedShow.id < position['id']),
+                WatchedShow.added_on.is_(None)
+            ))
+        query = query.order_by(WatchedShow.added_on.desc().nulls_last(), WatchedShow.id.desc())
+
+    if limit is None:
+        rows = db.session.execute(query).all()
+        has_more = False
+    else:
+        rows = db.session.execute(query.limit(limit + 1)).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+    names = ['id', 'added_on'] + [field for field in fields if field not in ('id', 'added_on')]
+    shows = []
+    for row in rows:
+        values = dict(zip(names, row))
+        values['added_on'] = _format_added_on(values['added_on'])
+        shows.append({field: values[field] for field in fields})
+
+    next_cursor = None
+    if has_more and rows:
+        last_id, last_added_on = rows[-1][0], rows[-1][1]
+        next_cursor = encode_cursor({
+            'id': last_id,
+            'added_on': last_added_on.isoformat() if last_added_on else None
+        })
+    return shows, next_cursor
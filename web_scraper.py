@@ -1,115 +1,114 @@
-import trafilatura
 import json
-import re
+import os
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from urllib.parse import quote
-from bs4 import BeautifulSoup
-import requests
+from html_extract import parse_first_search_result, parse_article_description, parse_article_list
+from http_client import HttpClient, CircuitOpenError
+from scrape_cache import netflix_cache, MISSING
+from catalog import (netflix_catalog, sanitize_title, catalog_key, trigrams, similarity,
+                     show_title_from_article, upsert_entries, known_title_keys)
+from models import db
+from poster_cache import poster_cache
+from metrics import timed, SCRAPE_RESULTS, CACHE_REQUESTS, UNVERIFIED_SHOWS
 
 logger = logging.getLogger(__name__)
 
-def sanitize_title(title):
-    """Sanitize title for URL usage"""
-    # Remove special characters and replace spaces with dashes
-    return re.sub(r'[^a-zA-Z0-9\s-]', '', title).strip().replace(' ', '-').lower()
+# Concurrency limit and overall deadline (seconds) for the enrichment stage
+ENRICH_MAX_WORKERS = int(os.environ.get("ENRICH_MAX_WORKERS", 5))
+ENRICH_DEADLINE = float(os.environ.get("ENRICH_DEADLINE", 12))
 
-def get_netflix_lovers_data(title):
+# One pool per process: scrapes still running past a request's deadline keep
+# a worker busy instead of piling up in fresh threads
+_enrich_executor = ThreadPoolExecutor(max_workers=ENRICH_MAX_WORKERS, thread_name_prefix="enrich")
+
+# Netflix Lovers Italia base URL (overridable to point at a local stand-in)
+NETFLIX_LOVERS_URL = os.environ.get("NETFLIX_LOVERS_URL", "https://www.netflixlovers.it").rstrip("/")
+
+# Shared keep-alive client for netflixlovers.it
+http_client = HttpClient(
+    connect_timeout=float(os.environ.get("SCRAPER_CONNECT_TIMEOUT", 3.05)),
+    read_timeout=float(os.environ.get("SCRAPER_READ_TIMEOUT", 8)),
+    retries=int(os.environ.get("SCRAPER_RETRIES", 2)),
+    pool_size=int(os.environ.get("SCRAPER_POOL_SIZE", 10)),
+    failure_threshold=int(os.environ.get("SCRAPER_BREAKER_THRESHOLD", 5)),
+    reset_timeout=float(os.environ.get("SCRAPER_BREAKER_RESET", 60)),
+)
+
+def _lookup_netflix_lovers(title, cancel_event=None):
     """
-    Cerca informazioni su una serie TV su Netflix Lovers Italia.
-    Restituisce un dizionario con i dati disponibili o None se non trovata.
+    Esegue la ricerca su Netflix Lovers Italia.
+    Restituisce i dati trovati o None se la serie non esiste; solleva
+    un'eccezione se il sito non è raggiungibile. Se il primo risultato è
+    un'altra serie restituisce found=False con il suo match_score, senza
+    scaricare l'articolo.
     """
-    try:
-        # Sanitize the title for the URL
-        safe_title = quote(sanitize_title(title))
-        
-        # Construct the URL for Netflix Lovers search
-        search_url = f"https://www.netflixlovers.it/?s={safe_title}"
-        logger.info(f"Searching Netflix Lovers for: {title} at URL: {search_url}")
+    # Sanitize the title for the URL
+    safe_title = quote(sanitize_title(title))
+    
+    # Construct the URL for Netflix Lovers search
+    search_url = f"{NETFLIX_LOVERS_URL}/?s={safe_title}"
+    logger.info(f"Searching Netflix Lovers for: {title} at URL: {search_url}")
+    
+    # Get the search results page through the shared client
+    with timed("scrape_search"):
+        response = http_client.get(search_url)
+    response.raise_for_status()  # Raise an exception for HTTP errors
+    
+    # Only the first search result is needed
+    with timed("parse_search"):
+        first_result = parse_first_search_result(response.text)
+    
+    if not first_result:
+        logger.warning(f"No search results found for: {title}")
+        return None
         
-        # Get the search results page using requests
-        try:
-            response = requests.get(search_url, timeout=10)
-            response.raise_for_status()  # Raise an exception for HTTP errors
-            
-            # Parse the HTML content with BeautifulSoup
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Look for search results
-            articles = soup.find_all('article')
-            
-            if not articles:
-                logger.warning(f"No search results found for: {title}")
-                return None
-                
-            # Get the first result
-            first_article = articles[0]
-            
-            # Extract the link and title
-            link_elem = first_article.find('a')
-            if not link_elem:
-                return None
-                
-            article_url = link_elem.get('href')
-            article_title = link_elem.get('title') or link_elem.text.strip()
-            
-            # Try to find an image
-            img_elem = first_article.find('img')
-            img_url = img_elem.get('src') if img_elem else None
-            
-            # Get more details from the article
-            try:
-                article_response = requests.get(article_url, timeout=10)
-                article_soup = BeautifulSoup(article_response.text, 'html.parser')
-                
-                # Try to extract a description
-                content_div = article_soup.find('div', class_='entry-content')
-                description = ""
-                if content_div:
-                    paragraphs = content_div.find_all('p')
-                    if paragraphs:
-                        # Get the first two paragraphs for the description
-                        description = " ".join([p.text.strip() for p in paragraphs[:2]])
-            except:
-                description = ""
-            
-            return {
-                "title": article_title or title,
-                "found": True,
-                "source": "Netflix Lovers Italia",
-                "search_url": search_url,
-                "article_url": article_url,
-                "img_url": img_url,
-                "description": description
-            }
-            
-        except Exception as req_e:
-            logger.error(f"Error fetching search results: {str(req_e)}")
-            # Fallback to trafilatura if requests fails
-            search_content = trafilatura.fetch_url(search_url)
-            if not search_content:
-                logger.warning(f"No content found for search: {title}")
-                return None
-                
-            # Extract the text content
-            search_text = trafilatura.extract(search_content)
-            
-            # If no results found
-            if "Nessun risultato" in search_text or not search_text:
-                logger.warning(f"No search results found for: {title}")
-                return None
-                
-            # Return basic data with search URL
-            return {
-                "title": title,
-                "found": True,
-                "source": "Netflix Lovers Italia",
-                "search_url": search_url,
-                "article_url": search_url
-            }
+    # Extract the link and title
+    article_url = first_result["url"]
+    if not article_url:
+        return None
+    article_title = first_result["title"] or title
+    img_url = first_result["img_url"]
+    
+    # How closely the first search result matches the requested title;
+    # it is often a different show, whose article isn't worth fetching
+    match_score = round(similarity(
+        trigrams(catalog_key(title)),
+        trigrams(catalog_key(show_title_from_article(article_title)))
+    ), 3)
+    if match_score < netflix_catalog.min_score:
+        logger.info(f"First search result for {title} doesn't match: {article_title}")
+        return {"title": article_title, "found": False, "match_score": match_score}
+    
+    # Stop here if the caller gave up on this show
+    if cancel_event is not None and cancel_event.is_set():
+        logger.info(f"Scrape cancelled for: {title}")
+        return None
+    
+    # Get more details from the article
+    try:
+        with timed("scrape_article"):
+            article_response = http_client.get(article_url)
         
+        # Get the first two paragraphs for the description
+        with timed("parse_article"):
+            description = parse_article_description(article_response.text, max_paragraphs=2)
     except Exception as e:
-        logger.error(f"Error searching for {title}: {str(e)}")
-        return None
+        logger.warning(f"Error fetching article for {title}: {str(e)}")
+        description = ""
+    
+    return {
+        "title": article_title,
+        "found": True,
+        "source": "Netflix Lovers Italia",
+        "search_url": search_url,
+        "article_url": article_url,
+        "img_url": img_url,
+        "description": description,
+        "match_score": match_score,
+    }
 
 def get_netflix_url(title):
     """
@@ -135,18 +134,92 @@ def get_tmdb_image_url(title):
     """
     return f"https://image.tmdb.org/t/p/w500/search?q={quote(title)}"
 
-def verify_netflix_show(title):
+def verify_netflix_show(title, cancel_event=None):
     """
     Verifica se una serie TV esiste effettivamente su Netflix Italia.
     Restituisce informazioni sulla serie se trovata, altrimenti None.
+    Il catalogo locale viene consultato per primo; la ricerca su Netflix
+    Lovers serve solo per i titoli che il catalogo non conosce.
     """
+    try:
+        with timed("catalog_lookup"):
+            match = netflix_catalog.lookup(title)
+    except Exception as e:
+        logger.error(f"Error searching the catalog for {title}: {str(e)}")
+        match = None
+    if match:
+        entry, score = match
+        CACHE_REQUESTS.inc(cache="catalog", result="hit")
+        return {
+            "title": entry["title"],
+            "found": True,
+            "source": entry.get("source") or "Catalogo Netflix Italia",
+            "article_url": entry.get("article_url"),
+            "img_url": entry.get("img_url"),
+            "description": entry.get("description") or "",
+            "match_score": score,
+        }
+    CACHE_REQUESTS.inc(cache="catalog", result="miss")
+    
+    cache_key = sanitize_title(title)
+    cached = netflix_cache.get(cache_key)
+    if cached is not MISSING:
+        CACHE_REQUESTS.inc(cache="netflix_lovers", result="hit")
+        # Entries cached before results were scored have no match_score
+        if cached and cached.get("match_score", 1.0) < netflix_catalog.min_score:
+            return None
+        return cached
+    CACHE_REQUESTS.inc(cache="netflix_lovers", result="miss")
+    
     # Per ora utilizziamo Netflix Lovers Italia come fonte
-    result = get_netflix_lovers_data(title)
-    if result and result.get("found"):
-        return result
-    return None
+    try:
+        result = _lookup_netflix_lovers(title, cancel_event=cancel_event)
+    except CircuitOpenError:
+        logger.warning(f"Netflix Lovers unavailable, skipping search for: {title}")
+        SCRAPE_RESULTS.inc(result="circuit_open")
+        return None
+    except Exception as e:
+        # Transport errors say nothing about the show, so they aren't cached
+        logger.error(f"Error searching for {title}: {str(e)}")
+        SCRAPE_RESULTS.inc(result="failure")
+        return None
+    outcome = "not_found"
+    if not (result and result.get("found")):
+        # A scored result that isn't found is a different show
+        if result and "match_score" in result:
+            outcome = "mismatch"
+        result = None
+    
+    # A cancelled scrape tells us nothing about the show, so don't cache it
+    if cancel_event is not None and cancel_event.is_set():
+        SCRAPE_RESULTS.inc(result="cancelled")
+    else:
+        SCRAPE_RESULTS.inc(result="success" if result else outcome)
+        netflix_cache.set(cache_key, result)
+        if result:
+            # Fill the catalog so the next lookup for this title stays local
+            netflix_catalog.add({
+                "title": title,
+                "article_url": result.get("article_url"),
+                "img_url": result.get("img_url"),
+                "description": result.get("description"),
+                "source": result.get("source"),
+            })
+    return result
 
-def enrich_show_data(show_data):
+def mark_unverified(show_data):
+    """
+    Segna una serie TV come non verificata, usando JustWatch come alternativa.
+    """
+    title = show_data.get("title", "")
+    show_data["verified"] = False
+    UNVERIFIED_SHOWS.inc()
+    if title:
+        # Aggiungiamo un URL a JustWatch come alternativa
+        show_data["info_url"] = get_justwatch_url(title)
+    return show_data
+
+def enrich_show_data(show_data, cancel_event=None):
     """
     Arricchisce i dati di una serie TV con informazioni verificate.
     Modifica le URL di immagini e informa e verifica l'esistenza.
@@ -157,17 +230,16 @@ def enrich_show_data(show_data):
             return show_data
             
         # Verifica l'esistenza su Netflix Italia
-        verified_data = verify_netflix_show(title)
+        verified_data = verify_netflix_show(title, cancel_event=cancel_event)
         
         # Se non verificata, manteniamo i dati originali ma aggiungiamo un flag
         if not verified_data:
-            show_data["verified"] = False
-            # Aggiungiamo un URL a JustWatch come alternativa
-            show_data["info_url"] = get_justwatch_url(title)
-            return show_data
+            return mark_unverified(show_data)
             
         # Se verificata, aggiorniamo i dati con informazioni più affidabili
         show_data["verified"] = True
+        if verified_data.get("match_score") is not None:
+            show_data["match_score"] = verified_data["match_score"]
         
         # Usa l'URL dell'articolo di Netflix Lovers come fonte principale
         article_url = verified_data.get("article_url")
@@ -183,6 +255,10 @@ def enrich_show_data(show_data):
         img_url = verified_data.get("img_url")
         if img_url and img_url.startswith("http"):
             show_data["verified_image_url"] = img_url
+            # Served resized from the local poster cache, when the proxy is enabled
+            poster_url = poster_cache.poster_url(img_url)
+            if poster_url:
+                show_data["poster_url"] = poster_url
         
         return show_data
         
@@ -190,6 +266,127 @@ def enrich_show_data(show_data):
         logger.error(f"Error enriching show data: {str(e)}")
         return show_data
 
+def _enrichment_result(future, show):
+    try:
+        result = future.result()
+    except Exception as e:
+        logger.error(f"Error enriching show data: {str(e)}")
+        result = None
+    return result if result is not None else mark_unverified(dict(show))
+
+def iter_enrichment(shows, deadline=None):
+    """
+    Arricchisce in parallelo le serie TV man mano che arrivano da shows
+    (una lista o un generatore) e produce eventi nell'ordine in cui accadono:
+    ('show', indice, serie) quando una serie viene ricevuta e
+    ('enriched', indice, serie arricchita) quando la sua verifica termina.
+    Dopo l'ultima serie ricevuta c'è una scadenza complessiva: le verifiche
+    ancora in corso vengono annullate e le serie restituite come non verificate.
+    Le verifiche usano il pool condiviso del processo (ENRICH_MAX_WORKERS).
+    """
+    deadline = ENRICH_DEADLINE if deadline is None else deadline
+    
+    futures = {}
+    originals = {}
+    cancel_events = {}
+    pending = set()
+    try:
+        for index, show in enumerate(shows):
+            originals[index] = show
+            cancel_events[index] = threading.Event()
+            # Work on copies so a late worker can't touch the data we return
+            future = _enrich_executor.submit(enrich_show_data, dict(show), cancel_events[index])
+            futures[future] = index
+            pending.add(future)
+            yield 'show', index, show
+            
+            # Report anything that finished while we were waiting for input
+            for future in [f for f in pending if f.done()]:
+                pending.discard(future)
+                index = futures[future]
+                yield 'enriched', index, _enrichment_result(future, originals[index])
+        
+        end_time = time.monotonic() + deadline
+        while pending:
+            remaining = end_time - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = futures[future]
+                yield 'enriched', index, _enrichment_result(future, originals[index])
+        
+        for future in list(pending):
+            pending.discard(future)
+            index = futures[future]
+            cancel_events[index].set()
+            future.cancel()
+            logger.warning(f"Enrichment deadline reached for: {originals[index].get('title', '')}")
+            yield 'enriched', index, mark_unverified(dict(originals[index]))
+    finally:
+        # Also reached when the consumer stops early, e.g. a client disconnect
+        for index in cancel_events:
+            cancel_events[index].set()
+        # Drop queued scrapes; running ones stop at their next request
+        for future in futures:
+            future.cancel()
+
+def enrich_shows_concurrently(shows, deadline=None):
+    """
+    Arricchisce più serie TV in parallelo con un limite di concorrenza e una
+    scadenza complessiva. Le serie non completate entro la scadenza vengono
+    annullate e restituite come non verificate.
+    """
+    results = [None] * len(shows)
+    for kind, index, show in iter_enrichment(shows, deadline):
+        if kind == 'enriched':
+            results[index] = show
+    return results
+
+def crawl_catalog(max_pages=20, path="", full=False):
+    """
+    Scorre le pagine di elenco di Netflix Lovers ({path}/page/N/), dalla più
+    recente, e aggiunge al catalogo locale le serie che non conosce ancora.
+    Si ferma alla prima pagina senza serie nuove, a meno che full sia True.
+    Serve un app context. Restituisce (pagine lette, voci aggiunte).
+    """
+    base_url = f"{NETFLIX_LOVERS_URL}/{path.strip('/')}".rstrip("/")
+    pages = stored = 0
+    for page in range(1, max_pages + 1):
+        page_url = f"{base_url}/page/{page}/" if page > 1 else f"{base_url}/"
+        with timed("scrape_listing"):
+            response = http_client.get(page_url)
+        if response.status_code == 404:
+            break
+        response.raise_for_status()
+        articles = parse_article_list(response.text)
+        pages += 1
+        if not articles:
+            break
+        
+        # A show has many articles; the newest one (listed first) is kept
+        entries = {}
+        for article in articles:
+            title = show_title_from_article(article["title"])
+            key = catalog_key(title)
+            if key and key not in entries:
+                entries[key] = {
+                    "title": title,
+                    "article_url": article["url"],
+                    "img_url": article["img_url"],
+                    "source": "Netflix Lovers Italia",
+                }
+        known = known_title_keys(list(entries))
+        new_entries = [entry for key, entry in entries.items() if key not in known]
+        if new_entries:
+            added, _ = upsert_entries(new_entries)
+            db.session.commit()
+            stored += added
+        logger.info(f"Catalog crawl: page {page}, {len(new_entries)} new shows in {len(articles)} articles")
+        if not new_entries and not full:
+            break
+    return pages, stored
+
 def process_openai_recommendations(recommendations_json):
     """
     Processa le raccomandazioni di OpenAI verificando e arricchendo i dati.
@@ -198,12 +395,7 @@ def process_openai_recommendations(recommendations_json):
         data = json.loads(recommendations_json)
         shows = data.get("shows", [])
         
-        enriched_shows = []
-        for show in shows:
-            enriched_show = enrich_show_data(show)
-            enriched_shows.append(enriched_show)
-            
-        data["shows"] = enriched_shows
+        data["shows"] = enrich_shows_concurrently(shows)
         return json.dumps(data)
         
     except Exception as e: